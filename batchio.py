@@ -0,0 +1,153 @@
+"""
+    Batched datagram I/O for the PTP Sender and Receiver
+    Python 3
+    coding: utf-8
+
+    Notes:
+        BatchSender queues outgoing datagrams and hands each run of equal-sized
+        datagrams for one address to the kernel in a single sendmsg with
+        UDP_SEGMENT (Linux GSO), so a window of segments costs one syscall.
+        BatchReceiver reads with recvmsg_into into one large buffer and, with
+        UDP_GRO enabled, gets many coalesced datagrams per call and splits them
+        again at the size the kernel reports.
+        Both fall back to one sendto/recvmsg per datagram where the kernel or
+        platform lacks the socket options.
+        A message is a tuple of buffers (see packet.encodeSegment) that sendmsg
+        gathers, so header and payload are only joined where sendmsg is missing.
+"""
+import socket
+import sys
+from packet import BufferPool
+
+# not exported by every Python build, the values are fixed by the Linux ABI
+SOL_UDP = getattr(socket, "SOL_UDP", 17)
+UDP_SEGMENT = getattr(socket, "UDP_SEGMENT", 103)
+UDP_GRO = getattr(socket, "UDP_GRO", 104)
+
+MAXDATAGRAM = 65507  # largest UDP payload over IPv4
+RECVBUFFER = 65536  # room for one GRO super-datagram
+SOCKETBUFFER = 4 * 1024 * 1024
+
+
+def enlargeBuffers(sock: socket.socket, size: int = SOCKETBUFFER):
+    '''ask for socket buffers that hold a few batches; the kernel may cap the request'''
+    for option in (socket.SO_SNDBUF, socket.SO_RCVBUF):
+        try:
+            if sock.getsockopt(socket.SOL_SOCKET, option) < size:
+                sock.setsockopt(socket.SOL_SOCKET, option, size)
+        except OSError:
+            pass
+
+
+class BatchSender:
+    '''
+    Datagrams added with add() wait until flush(), or until MAXSEGMENTS are
+    pending. Consecutive datagrams to the same address where only the last may
+    be shorter form one GSO send. Single datagrams are gathered by a plain
+    sendmsg with sendto as the fallback. On a non-blocking socket (the asyncio
+    engines) a datagram that finds the send buffer full is dropped, as a full
+    queue on the path would drop it.
+    '''
+    MAXSEGMENTS = 64  # UDP_MAX_SEGMENTS on older kernels
+
+    def __init__(self, sock: socket.socket, gso: bool = True) -> None:
+        self.sock = sock
+        self.gather = hasattr(sock, "sendmsg")
+        self.gso = gso and self.gather and self.probe()
+        self.pending = []  # (message, address)
+        self.syscalls = 0
+        self.datagrams = 0
+        self.dropped = 0  # non-blocking socket only: datagrams that found the send buffer full
+
+    def probe(self) -> bool:
+        try:
+            self.sock.getsockopt(SOL_UDP, UDP_SEGMENT)
+            return True
+        except OSError:
+            return False
+
+    def send(self, message: tuple, address: tuple):
+        '''send one message now'''
+        self.datagrams += 1
+        self.syscalls += 1
+        if self.gather:
+            try:
+                self.sock.sendmsg(message, (), 0, address)
+                return
+            except BlockingIOError:
+                pass
+        try:
+            self.sock.sendto(b"".join(message), address)
+        except BlockingIOError:
+            self.dropped += 1
+
+    def add(self, message: tuple, address: tuple):
+        self.pending.append((message, sum(map(len, message)), address))
+        if len(self.pending) >= self.MAXSEGMENTS:
+            self.flush()
+
+    def flush(self):
+        pending = self.pending
+        self.pending = []
+        i = 0
+        while i < len(pending):
+            _, size, address = pending[i]
+            total = size
+            j = i + 1
+            while self.gso and j < len(pending) and j - i < self.MAXSEGMENTS:
+                _, nextSize, nextAddress = pending[j]
+                if nextAddress != address or nextSize > size or total + nextSize > MAXDATAGRAM:
+                    break
+                total += nextSize
+                j += 1
+                if nextSize < size:
+                    break  # a short datagram has to end the run
+            self.sendRun(pending[i:j], address, size)
+            i = j
+
+    def sendRun(self, run: list, address: tuple, size: int):
+        if len(run) > 1:
+            try:
+                buffers = [buffer for message, _, _ in run for buffer in message]
+                self.sock.sendmsg(buffers, [(SOL_UDP, UDP_SEGMENT, size.to_bytes(2, sys.byteorder))], 0, address)
+                self.datagrams += len(run)
+                self.syscalls += 1
+                return
+            except BlockingIOError:
+                pass  # non-blocking socket is full, try the datagrams one by one
+            except OSError:
+                self.gso = False  # e.g. EIO from a device without checksum offload
+        for message, _, _ in run:
+            self.send(message, address)
+
+
+class BatchReceiver:
+    '''
+    recv() returns every datagram of one read together with the source
+    address. The returned memoryviews point into a pooled buffer that a later
+    recv() overwrites, so callers copy what they keep.
+    '''
+    def __init__(self, sock: socket.socket, gro: bool = True) -> None:
+        self.sock = sock
+        self.pool = BufferPool(RECVBUFFER)
+        self.gro = gro and hasattr(sock, "recvmsg_into") and self.enableGro()
+        self.ancillarySize = socket.CMSG_SPACE(4) if self.gro else 0
+
+    def enableGro(self) -> bool:
+        try:
+            self.sock.setsockopt(SOL_UDP, UDP_GRO, 1)
+            return True
+        except OSError:
+            return False
+
+    def recv(self) -> tuple:
+        buffer, view = self.pool.acquire()
+        if not self.gro:
+            nbytes, address = self.sock.recvfrom_into(buffer)
+            return [view[:nbytes]], address
+        nbytes, ancillary, _, address = self.sock.recvmsg_into([buffer], self.ancillarySize)
+        size = nbytes
+        for level, kind, data in ancillary:
+            if level == SOL_UDP and kind == UDP_GRO:
+                size = int.from_bytes(data[:4], sys.byteorder) or nbytes
+        return [view[i:min(i + size, nbytes)] for i in range(0, nbytes, max(size, 1))], address
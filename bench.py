@@ -0,0 +1,260 @@
+"""
+    Throughput benchmark for the PTP Sender and Receiver
+    Python 3
+    Usage: python3 bench.py [--max-win=5000,20000] [--rot=0.2] [--loss=0,0.01,ge:0.01:0.3] [--size=toSend.txt,1M,16M]
+           [--repeat=N] [--seed=N] [--port=N] [--timeout=seconds] [--format=table|json] [--workdir=path]
+           [--sender-options="..."] [--receiver-options="..."] [--emulator-options="..."]
+    coding: utf-8
+
+    Notes:
+        Runs one transfer for every combination of the comma-separated values of
+        --max-win, --rot, --loss and --size, each through emulator.py so that the
+        loss pattern is seeded and repeatable, and reports per run:
+            throughput  file size over the sender's transfer time, from the SYN to
+                        the ACK of its FIN
+            retx        retransmitted / first-time DATA segments
+            cpu         user + system seconds of the sender and of the receiver (os.wait4)
+            lost        datagrams the emulator dropped in each direction
+        --size takes a file name or a size such as 64K, 16M or 1G; sizes are filled
+        by repeating toSend.txt, generated once into the work directory.
+        The transfer time and segment counts come from the statistics at the end
+        of Sender_log.txt, so neither interpreter start-up nor an instrumented
+        sender (--metrics) is part of the measurement.
+        --repeat=N runs every combination N times with seeds --seed, --seed+1, ...
+        The *-options strings are split like a shell command line and appended to
+        each program's arguments, e.g. --emulator-options="--delay=10 --jitter=2"
+        or --sender-options="--cc=vegas --sack=off".
+        The work directory (a temporary one unless --workdir is given) keeps the
+        logs of the last run.
+"""
+import itertools
+import json
+import os
+import shlex
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from options import parseOptions
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+UNITS = {"K": 1 << 10, "M": 1 << 20, "G": 1 << 30}
+STARTUP = 0.3  # seconds for the receiver and emulator to bind before the sender starts
+
+
+def parseSize(text: str):
+    '''bytes for 64K/16M/1G style sizes, None for a file name'''
+    digits, unit = (text[:-1], text[-1].upper()) if text[-1:].upper() in UNITS else (text, "")
+    if not digits.isdigit():
+        return None
+    return int(digits) * UNITS.get(unit, 1)
+
+
+def generate(size: int, pattern: str, directory: str, label: str) -> str:
+    '''a file of size bytes made of repeated copies of pattern, created once'''
+    fileName = os.path.join(directory, f"payload-{label}.txt")
+    if os.path.exists(fileName) and os.path.getsize(fileName) == size:
+        return fileName
+    with open(pattern, "rb") as file:
+        block = file.read() or b"\n"
+    block *= max(1, (1 << 20) // len(block))  # write in pieces of about a megabyte
+    with open(fileName, "wb") as file:
+        for _ in range(size // len(block)):
+            file.write(block)
+        file.write(block[:size % len(block)])
+    return fileName
+
+
+class Process:
+    '''a child program whose resource usage is collected with os.wait4'''
+    def __init__(self, args: list, directory: str) -> None:
+        self.popen = subprocess.Popen([sys.executable] + args, cwd=directory, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        self.start = time.perf_counter()
+
+    def wait(self, timeout: float) -> tuple:
+        '''(exit status, wall seconds, cpu seconds); the child is killed after timeout'''
+        killer = threading.Timer(timeout, self.popen.kill)
+        killer.start()
+        try:
+            _, status, usage = os.wait4(self.popen.pid, 0)
+        finally:
+            killer.cancel()
+        wall = time.perf_counter() - self.start
+        self.popen.returncode = os.waitstatus_to_exitcode(status)
+        return self.popen.returncode, wall, usage.ru_utime + usage.ru_stime
+
+    def stop(self, timeout: float) -> tuple:
+        self.popen.terminate()
+        return self.wait(timeout)
+
+
+class Bench:
+    def __init__(self, max_win: str = "5000", rot: str = "0.2", loss: str = "0", size: str = "toSend.txt", repeat: str = "1",
+                 seed: str = "1", port: str = "9000", timeout: str = "120", format: str = "table", workdir: str = "",
+                 sender_options: str = "", receiver_options: str = "", emulator_options: str = "") -> None:
+        '''
+        :param max_win: comma-separated sender windows in bytes.
+        :param rot: comma-separated retransmission timeouts in seconds.
+        :param loss: comma-separated forward loss settings for emulator.py --loss.
+        :param size: comma-separated files or sizes (64K, 16M, 1G) of generated files.
+        :param repeat: runs of every combination.
+        :param seed: seed of the first run, incremented for each repeat.
+        :param port: receiver port; the emulator and sender use the next two.
+        :param timeout: seconds before a run is killed and reported as failed.
+        :param format: "table" or "json".
+        :param workdir: directory for payloads, outputs and logs; a temporary one is removed at exit.
+        :param sender_options: extra sender arguments.
+        :param receiver_options: extra receiver arguments.
+        :param emulator_options: extra emulator arguments.
+        '''
+        self.maxWins = max_win.split(",")
+        self.rots = rot.split(",")
+        self.losses = loss.split(",")
+        self.sizes = size.split(",")
+        self.repeat = int(repeat)
+        self.seed = int(seed)
+        self.receiverPort = int(port)
+        self.emulatorPort = self.receiverPort + 1
+        self.senderPort = self.receiverPort + 2
+        self.timeout = float(timeout)
+        if format not in ("table", "json"):
+            raise ValueError(f"bad format {format!r}, expected table or json")
+        self.format = format
+        self.keep = bool(workdir)
+        self.directory = os.path.abspath(workdir) if workdir else tempfile.mkdtemp(prefix="ptp-bench-")
+        os.makedirs(self.directory, exist_ok=True)
+        self.senderOptions = shlex.split(sender_options)
+        self.receiverOptions = shlex.split(receiver_options)
+        self.emulatorOptions = shlex.split(emulator_options)
+
+    def payload(self, size: str) -> str:
+        nbytes = parseSize(size)
+        if nbytes is None:
+            return os.path.abspath(size if os.path.exists(size) else os.path.join(HERE, size))
+        return generate(nbytes, os.path.join(HERE, "toSend.txt"), self.directory, size)
+
+    def runOnce(self, fileName: str, maxWin: str, rot: str, loss: str, seed: int) -> dict:
+        output = os.path.join(self.directory, "FileReceived.txt")
+        senderLog = os.path.join(self.directory, "Sender_log.txt")
+        statsFile = os.path.join(self.directory, "emulator.json")
+        for name in (output, senderLog, statsFile):
+            if os.path.exists(name):
+                os.remove(name)
+
+        receiver = Process([os.path.join(HERE, "receiver.py"), str(self.receiverPort), str(self.emulatorPort), output, "0", "0"]
+                           + self.receiverOptions, self.directory)
+        emulator = Process([os.path.join(HERE, "emulator.py"), str(self.emulatorPort), str(self.receiverPort), f"--loss={loss}",
+                            f"--seed={seed}", f"--stats={statsFile}"] + self.emulatorOptions, self.directory)
+        time.sleep(STARTUP)
+        sender = Process([os.path.join(HERE, "sender.py"), str(self.senderPort), str(self.emulatorPort), fileName, maxWin, rot]
+                         + self.senderOptions, self.directory)
+        senderStatus, _, senderCpu = sender.wait(self.timeout)
+        receiverStatus, _, receiverCpu = receiver.wait(self.timeout)
+        emulator.stop(self.timeout)
+
+        size = os.path.getsize(fileName)
+        ok = senderStatus == 0 and receiverStatus == 0 and os.path.exists(output) and sameContent(fileName, output)
+        sent = readStatistics(senderLog)
+        lost = readJson(statsFile)
+        elapsed = float(sent.get("Transfer Time (ms)", 0)) / 1000
+        segments = int(sent.get("Number of Data Segments Sent (excluding retransmissions)", 0))
+        retransmitted = int(sent.get("Number of Retransmitted Data Segments", 0))
+        ok = ok and elapsed > 0
+        return {
+            "file": os.path.basename(fileName),
+            "size": size,
+            "maxWin": int(maxWin),
+            "rot": float(rot),
+            "loss": loss,
+            "seed": seed,
+            "ok": ok,
+            "elapsed": elapsed,
+            "throughput": size / elapsed if ok else 0,
+            "dataSegments": segments,
+            "retransmittedSegments": retransmitted,
+            "retransmissionRatio": retransmitted / segments if segments else 0,
+            "senderCpu": senderCpu,
+            "receiverCpu": receiverCpu,
+            "forwardLost": lost.get("forward", {}).get("lost", 0),
+            "reverseLost": lost.get("reverse", {}).get("lost", 0),
+        }
+
+    def run(self) -> list:
+        results = []
+        try:
+            for size, loss, maxWin, rot in itertools.product(self.sizes, self.losses, self.maxWins, self.rots):
+                fileName = self.payload(size)
+                for run in range(self.repeat):
+                    result = self.runOnce(fileName, maxWin, rot, loss, self.seed + run)
+                    results.append(result)
+                    if self.format == "table":
+                        if len(results) == 1:
+                            print(tableHeader())
+                        print(tableRow(result), flush=True)
+        finally:
+            if not self.keep:
+                shutil.rmtree(self.directory, ignore_errors=True)
+        if self.format == "json":
+            print(json.dumps(results, indent=1))
+        return results
+
+
+def sameContent(first: str, second: str) -> bool:
+    with open(first, "rb") as a, open(second, "rb") as b:
+        while True:
+            x, y = a.read(1 << 20), b.read(1 << 20)
+            if x != y:
+                return False
+            if not x:
+                return True
+
+
+def readStatistics(fileName: str) -> dict:
+    '''the "name:<tab>value" statistics lines of a sender log'''
+    statistics = {}
+    try:
+        with open(fileName, encoding="utf-8", errors="replace") as file:
+            for line in file:
+                name, tab, value = line.rstrip("\n").partition(":\t")
+                if tab:
+                    statistics[name] = value
+    except OSError:
+        pass
+    return statistics
+
+
+def readJson(fileName: str) -> dict:
+    try:
+        with open(fileName) as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return {}
+
+
+COLUMNS = [("file", "{:>16}"), ("size", "{:>11}"), ("maxWin", "{:>8}"), ("rot", "{:>6}"), ("loss", "{:>14}"),
+           ("seed", "{:>5}"), ("ok", "{!s:>5}"), ("elapsed", "{:>8.3f}"), ("throughput", "{:>12.0f}"),
+           ("retransmissionRatio", "{:>6.3f}"), ("senderCpu", "{:>7.3f}"), ("receiverCpu", "{:>7.3f}"),
+           ("forwardLost", "{:>7}"), ("reverseLost", "{:>7}")]
+HEADINGS = ["file", "bytes", "max_win", "rot", "loss", "seed", "ok", "time(s)", "bytes/s", "retx", "tx cpu", "rx cpu",
+            "lost", "ackLost"]
+
+
+def tableHeader() -> str:
+    widths = [len(fmt.format(0 if "f}" in fmt else "")) for _, fmt in COLUMNS]
+    return " ".join(f"{heading:>{width}}" for heading, width in zip(HEADINGS, widths))
+
+
+def tableRow(result: dict) -> str:
+    return " ".join(fmt.format(result[name]) for name, fmt in COLUMNS)
+
+
+if __name__ == '__main__':
+    if any(not arg.startswith("--") for arg in sys.argv[1:]):
+        print(
+            "\n===== Error usage, python3 bench.py [--max-win=5000,20000] [--rot=0.2] [--loss=0,0.01,ge:0.01:0.3] [--size=toSend.txt,1M,16M] [--repeat=N] [--seed=N] [--port=N] [--timeout=s] [--format=table|json] [--workdir=path] [--sender-options=\"...\"] [--receiver-options=\"...\"] [--emulator-options=\"...\"] ======\n")
+        exit(0)
+
+    bench = Bench(**parseOptions(sys.argv[1:]))
+    bench.run()
@@ -0,0 +1,157 @@
+"""
+    Stream compression for the PTP Sender and Receiver
+    Python 3
+    Usage: python3 compression.py FileToSend.txt   (probe every codec on a file)
+    coding: utf-8
+
+    Notes:
+        With --compress=<codec>[:level] the sender offers the codec in the SYN.
+        If the receiver echoes it, the file is compressed as one stream and the
+        compressed bytes are what gets cut into segments, sequenced, ACKed and
+        retransmitted; the receiver decompresses them as they become contiguous.
+        zlib and lzma come with Python, zstd needs the zstandard package on both
+        sides.
+
+        Before offering a codec the sender compresses a PROBE-sized sample from
+        the start of a regular file. If that saves less than MINSAVING the data
+        is taken to be incompressible (already compressed, encrypted, media)
+        and the transfer goes out raw. Pipes and stdin cannot be sampled and
+        are always compressed.
+"""
+import lzma
+import os
+import sys
+import zlib
+try:
+    import zstandard  # optional, --compress=zstd
+except ImportError:
+    zstandard = None
+
+ZLIB = 1
+LZMA = 2
+ZSTD = 3
+CODECS = {"zlib": ZLIB, "lzma": LZMA, "zstd": ZSTD}
+LEVELS = {ZLIB: 6, LZMA: 1, ZSTD: 3}  # default level (lzma preset) of each codec
+PROBE = 256 * 1024
+MINSAVING = 0.1  # compress only if the probe shrinks by at least this fraction
+READSIZE = 64 * 1024  # raw bytes handed to the compressor at a time
+
+
+def available(codec: int) -> bool:
+    return codec in (ZLIB, LZMA) or (codec == ZSTD and zstandard is not None)
+
+
+def parseCompression(text: str) -> tuple:
+    '''(codec, level) from a --compress=<codec>[:level] value'''
+    name, _, level = text.partition(":")
+    if name not in CODECS:
+        raise ValueError(f"bad compress {text!r}, expected off, zlib, lzma or zstd with an optional :level")
+    codec = CODECS[name]
+    if not available(codec):
+        raise ValueError(f"--compress={name} needs the zstandard package")
+    if not level:
+        return codec, LEVELS[codec]
+    if not level.isdigit():
+        raise ValueError(f"bad compress level {level!r}, expected an integer")
+    return codec, int(level)
+
+
+def compressor(codec: int, level: int):
+    '''incremental compressor with compress(data) and flush()'''
+    if codec == ZLIB:
+        return zlib.compressobj(level)
+    if codec == LZMA:
+        return lzma.LZMACompressor(preset=level)
+    return zstandard.ZstdCompressor(level=level).compressobj()
+
+
+class StreamDecompressor:
+    '''incremental decompressor for one codec; lzma has no flush, the others may hold back a tail'''
+    def __init__(self, codec: int) -> None:
+        if codec == ZLIB:
+            self.decompressor = zlib.decompressobj()
+        elif codec == LZMA:
+            self.decompressor = lzma.LZMADecompressor()
+        else:
+            self.decompressor = zstandard.ZstdDecompressor().decompressobj()
+
+    def decompress(self, data) -> bytes:
+        return self.decompressor.decompress(data)
+
+    def flush(self) -> bytes:
+        flush = getattr(self.decompressor, "flush", None)
+        return flush() if flush is not None else b""
+
+
+def probe(fileName: str, codec: int, level: int):
+    '''compressed / raw size of a sample of the file, or None when it cannot be sampled'''
+    if fileName == "-" or not os.path.isfile(fileName):
+        return None
+    with open(fileName, "rb") as file:
+        sample = file.read(PROBE)
+    if not sample:
+        return None
+    stream = compressor(codec, level)
+    return len(stream.compress(sample) + stream.flush()) / len(sample)
+
+
+class CompressedSource:
+    '''
+    Segments of the compressed stream of a raw source that hands out READSIZE
+    pieces (a SegmentSource). The compressed bytes are kept in one
+    immutable buffer so every segment can be a memoryview of it, as with a
+    mapped file; only the unsent tail is copied when more output arrives.
+    '''
+    def __init__(self, source, codec: int, level: int, segmentSize: int) -> None:
+        self.source = source
+        self.compressor = compressor(codec, level)
+        self.segmentSize = segmentSize
+        self.buffer = b""
+        self.offset = 0
+        self.finished = False
+        self.rawBytes = 0  # file bytes compressed so far
+
+    def needsFill(self) -> bool:
+        '''True when next() has to compress (and maybe read) more of the file'''
+        return len(self.buffer) - self.offset < self.segmentSize and not self.finished
+
+    def fill(self):
+        '''
+        read and compress until next() has a segment to hand out: the compressor
+        may buffer several pieces before it emits anything, and all of that work
+        belongs outside the event loop of the asyncio engine
+        '''
+        while self.needsFill():
+            chunk = self.source.next()
+            if chunk is None:
+                output = self.compressor.flush()
+                self.finished = True
+            else:
+                self.rawBytes += len(chunk)
+                output = self.compressor.compress(chunk)
+            if output:
+                self.buffer = self.buffer[self.offset:] + output
+                self.offset = 0
+
+    def next(self):
+        '''payload of the next segment, or None at the end of the compressed stream'''
+        if self.needsFill():
+            self.fill()
+        if self.offset >= len(self.buffer):
+            return None
+        segment = memoryview(self.buffer)[self.offset:self.offset + self.segmentSize]
+        self.offset += len(segment)
+        return segment
+
+    def close(self):
+        self.source.close()
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 2:
+        print("\n===== Error usage, python3 compression.py FileToSend.txt ======\n")
+        exit(0)
+    for name, codec in CODECS.items():
+        if available(codec):
+            ratio = probe(sys.argv[1], codec, LEVELS[codec])
+            print(f"{name:6}{'-' if ratio is None else f'{ratio:.3f}'}")
@@ -0,0 +1,183 @@
+"""
+    Congestion control and pacing for the PTP Sender
+    Python 3
+    coding: utf-8
+
+    Notes:
+        Every controller works in bytes and never lets the window exceed the
+        max_win given to sender.py, which stays the hard cap:
+            fixed   - the original behaviour, the window is always max_win
+            newreno - slow start, AIMD congestion avoidance, fast recovery (RFC 6582)
+            vegas   - delay based: grows while the RTT stays near the base RTT
+                      and backs off as queueing delay builds up
+        Pacer spreads each window over one smoothed RTT so a full window is not
+        put on the wire back to back.
+"""
+
+
+class CongestionController:
+    '''fixed window: the original sender, always max_win bytes in flight'''
+    name = "fixed"
+
+    def __init__(self, mss: int, maxWin: int) -> None:
+        self.mss = mss
+        self.maxWin = maxWin
+        self.cwnd = maxWin
+        self.ssthresh = maxWin
+        self.inRecovery = False
+
+    def window(self) -> int:
+        '''bytes that may be in flight right now'''
+        return max(self.mss, min(int(self.cwnd), self.maxWin))
+
+    def slowStart(self) -> bool:
+        return self.cwnd < self.ssthresh
+
+    def onAck(self, ackedBytes: int, rtt, inFlight: int):
+        '''new data acknowledged; rtt is the sample for this ACK or None (Karn's rule)'''
+        pass
+
+    def onDupAck(self):
+        '''a duplicate ACK arrived while in fast recovery'''
+        pass
+
+    def onFastRetransmit(self, inFlight: int):
+        '''third duplicate ACK: enter fast recovery'''
+        pass
+
+    def onRecoveryExit(self):
+        '''everything outstanding at the start of recovery has been acknowledged'''
+        pass
+
+    def onTimeout(self, inFlight: int):
+        '''the retransmission timer of the oldest segment expired'''
+        pass
+
+
+class NewReno(CongestionController):
+    '''slow start, additive increase / multiplicative decrease and NewReno fast recovery'''
+    name = "newreno"
+    INITIAL_SEGMENTS = 4
+
+    def __init__(self, mss: int, maxWin: int) -> None:
+        super().__init__(mss, maxWin)
+        self.cwnd = min(self.INITIAL_SEGMENTS * mss, maxWin)
+        self.ssthresh = maxWin
+
+    def onAck(self, ackedBytes: int, rtt, inFlight: int):
+        if self.inRecovery:
+            # partial ACK: deflate by what left the network, keep one MSS for the retransmission
+            self.cwnd = max(self.cwnd - ackedBytes + self.mss, self.mss)
+        elif self.slowStart():
+            # appropriate byte counting with L = 2 (RFC 3465): a delayed ACK covering two
+            # segments still grows the window by both
+            self.cwnd += min(ackedBytes, 2 * self.mss)
+        else:
+            self.cwnd += self.mss * ackedBytes / self.cwnd
+        self.cwnd = min(self.cwnd, self.maxWin)
+
+    def onDupAck(self):
+        if self.inRecovery:
+            self.cwnd = min(self.cwnd + self.mss, self.maxWin)  # window inflation
+
+    def onFastRetransmit(self, inFlight: int):
+        self.ssthresh = max(inFlight // 2, 2 * self.mss)
+        self.cwnd = self.ssthresh + 3 * self.mss
+        self.inRecovery = True
+
+    def onRecoveryExit(self):
+        self.cwnd = self.ssthresh
+        self.inRecovery = False
+
+    def onTimeout(self, inFlight: int):
+        self.ssthresh = max(inFlight // 2, 2 * self.mss)
+        self.cwnd = self.mss
+        self.inRecovery = False
+
+
+class Vegas(NewReno):
+    '''
+    TCP Vegas. Once per RTT the expected rate (cwnd / baseRtt) is compared with
+    the actual rate (cwnd / rtt); the difference, in segments queued in the
+    network, grows the window below ALPHA and shrinks it above BETA. Losses are
+    handled like NewReno.
+    '''
+    name = "vegas"
+    ALPHA = 2
+    BETA = 4
+    GAMMA = 1
+
+    def __init__(self, mss: int, maxWin: int) -> None:
+        super().__init__(mss, maxWin)
+        self.baseRtt = None
+        self.minRtt = None  # smallest sample in the current round
+        self.roundBytes = 0  # bytes acknowledged in the current round
+
+    def onAck(self, ackedBytes: int, rtt, inFlight: int):
+        if rtt is not None:
+            self.baseRtt = rtt if self.baseRtt is None else min(self.baseRtt, rtt)
+            self.minRtt = rtt if self.minRtt is None else min(self.minRtt, rtt)
+        if self.inRecovery or self.baseRtt is None:
+            super().onAck(ackedBytes, rtt, inFlight)
+            return
+        self.roundBytes += ackedBytes
+        if self.roundBytes < self.cwnd or self.minRtt is None:
+            return  # adjust once per window of data
+        queued = self.cwnd / self.mss * (1 - self.baseRtt / self.minRtt)
+        if self.slowStart():
+            if queued > self.GAMMA:
+                self.ssthresh = self.cwnd  # queue is building, leave slow start
+            else:
+                self.cwnd *= 2
+        elif queued < self.ALPHA:
+            self.cwnd += self.mss
+        elif queued > self.BETA:
+            self.cwnd -= self.mss
+        self.cwnd = min(max(self.cwnd, 2 * self.mss), self.maxWin)
+        self.roundBytes = 0
+        self.minRtt = None
+
+
+CONTROLLERS = {controller.name: controller for controller in (CongestionController, NewReno, Vegas)}
+
+
+class Pacer:
+    '''
+    Token bucket refilled at GAIN * cwnd / srtt bytes per second. The bucket
+    holds a couple of segments or one millisecond of data, whichever is larger,
+    so sleeps stay above timer granularity; a send may overdraw it and the next
+    one waits until the debt is repaid.
+    '''
+    SLOW_START_GAIN = 2.0
+    GAIN = 1.25
+
+    def __init__(self, mss: int) -> None:
+        self.mss = mss
+        self.rate = None  # bytes per second, None until an RTT is known
+        self.burst = 2 * mss
+        self.tokens = self.burst
+        self.stamp = None
+
+    def update(self, cwnd: float, srtt, slowStart: bool):
+        if not srtt:
+            return
+        self.rate = (self.SLOW_START_GAIN if slowStart else self.GAIN) * cwnd / srtt
+        self.burst = max(2 * self.mss, self.rate * 0.001)
+
+    def delay(self, now: float) -> float:
+        '''seconds to wait before the next segment may leave'''
+        if self.rate is None:
+            return 0
+        self.refill(now)
+        return 0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def consume(self, size: int, now: float):
+        if self.rate is None:
+            return
+        self.refill(now)
+        self.tokens -= size
+
+    def refill(self, now: float):
+        if self.stamp is not None:
+            self.tokens = min(self.burst, self.tokens + (now - self.stamp) * self.rate)
+        self.stamp = now
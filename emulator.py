@@ -0,0 +1,262 @@
+"""
+    Network emulator for the PTP Sender and Receiver
+    Python 3
+    Usage: python3 emulator.py listen_port receiver_port [--loss=P|ge:p:r[:bad[:good]]] [--reverse-loss=...]
+           [--delay=ms] [--jitter=ms] [--reorder=P] [--reorder-gap=ms] [--duplicate=P]
+           [--rate=bits/s] [--queue=bytes] [--seed=N] [--stats=file.json]
+    coding: utf-8
+
+    Notes:
+        A UDP proxy to put between the sender and the receiver. Start the receiver
+        with flp and rlp at 0, then the emulator, then point the sender at listen_port:
+            python3 receiver.py 9000 10000 FileReceived.txt 0 0
+            python3 emulator.py 8000 9000 --loss=0.01 --delay=20 --seed=1
+            python3 sender.py 10000 8000 toSend.txt 5000 0.2
+        Datagrams from the sender go to receiver_port, ACKs come back from there
+        and are returned to the address the sender last sent from.
+
+        Forward (sender to receiver) datagrams go through, in order:
+            --loss       Bernoulli loss with probability P, or ge:p:r:bad:good for
+                         Gilbert-Elliott bursts: p = P(good -> bad), r = P(bad -> good),
+                         bad/good = loss probability in each state (default 1 and 0)
+            --rate       a bottleneck of that many bits per second with a drop-tail
+                         queue of --queue bytes (default 0: no limit)
+            --delay      one-way delay in milliseconds, varied by up to +/- --jitter
+                         (jitter alone may reorder, as with netem)
+            --reorder    probability that a datagram is held back --reorder-gap ms
+                         (default 5) more than its neighbours
+            --duplicate  probability that a datagram is delivered twice
+        ACKs only see --reverse-loss, --delay and --jitter.
+
+        Every random choice comes from random.Random(--seed) (default 1), one
+        generator per direction, so the same options drop, delay and reorder the
+        same datagrams in every run with the same traffic. Counters are printed
+        on exit (Ctrl-C or SIGTERM) and written to --stats as JSON.
+"""
+import heapq
+import json
+import random
+import selectors
+import signal
+import socket
+import sys
+import time
+from batchio import RECVBUFFER, enlargeBuffers
+from options import parseOptions
+
+
+class Bernoulli:
+    '''every datagram is lost independently with probability p'''
+    def __init__(self, p: float) -> None:
+        self.p = p
+
+    def lost(self, rng: random.Random) -> bool:
+        return self.p > 0 and rng.random() < self.p
+
+
+class GilbertElliott:
+    '''
+    Two-state Markov chain: a datagram moves the chain (good -> bad with
+    probability p, bad -> good with probability r) and is then lost with the
+    loss probability of the state it is in. The mean burst lasts 1/r datagrams.
+    '''
+    def __init__(self, p: float, r: float, bad: float = 1.0, good: float = 0.0) -> None:
+        self.p = p
+        self.r = r
+        self.lossBad = bad
+        self.lossGood = good
+        self.bad = False
+
+    def lost(self, rng: random.Random) -> bool:
+        if rng.random() < (self.r if self.bad else self.p):
+            self.bad = not self.bad
+        return rng.random() < (self.lossBad if self.bad else self.lossGood)
+
+
+def parseLoss(text: str):
+    '''--loss value: a probability, or ge:p:r[:bad[:good]]'''
+    try:
+        if text.startswith("ge:"):
+            values = [float(value) for value in text[3:].split(":")]
+            if 2 <= len(values) <= 4 and all(0 <= value <= 1 for value in values):
+                return GilbertElliott(*values)
+        elif 0 <= float(text) <= 1:
+            return Bernoulli(float(text))
+    except ValueError:
+        pass
+    raise ValueError(f"bad loss {text!r}, expected a probability or ge:p:r[:bad[:good]]")
+
+
+def parseProbability(name: str, text: str) -> float:
+    try:
+        value = float(text)
+    except ValueError:
+        value = -1
+    if not 0 <= value <= 1:
+        raise ValueError(f"bad {name} {text!r}, expected a probability between 0 and 1")
+    return value
+
+
+def parseAmount(name: str, text: str) -> float:
+    try:
+        value = float(text)
+    except ValueError:
+        value = -1
+    if value < 0:
+        raise ValueError(f"bad {name} {text!r}, expected a number >= 0")
+    return value
+
+
+class Link:
+    '''one direction of the emulated path: decides when, if ever, each datagram leaves'''
+    def __init__(self, rng: random.Random, loss, delay: float = 0, jitter: float = 0, reorder: float = 0,
+                 reorderGap: float = 0, duplicate: float = 0, rate: float = 0, queue: int = 0) -> None:
+        self.rng = rng
+        self.loss = loss
+        self.delay = delay
+        self.jitter = jitter
+        self.reorder = reorder
+        self.reorderGap = reorderGap
+        self.duplicate = duplicate
+        self.rate = rate  # bytes per second, 0 for no bottleneck
+        self.queue = queue  # bytes waiting for the bottleneck before drop-tail
+        self.busyUntil = 0.0
+        self.counters = dict(received=0, lost=0, queueDrops=0, reordered=0, duplicated=0, forwarded=0, bytes=0)
+
+    def admit(self, now: float, size: int) -> list:
+        '''departure times of a datagram arriving now: none if it is dropped, two if duplicated'''
+        counters = self.counters
+        counters["received"] += 1
+        if self.loss.lost(self.rng):
+            counters["lost"] += 1
+            return []
+        departure = now
+        if self.rate:
+            start = max(now, self.busyUntil)
+            if self.queue and (start - now) * self.rate > self.queue:
+                counters["queueDrops"] += 1
+                return []
+            self.busyUntil = departure = start + size / self.rate
+        if self.delay or self.jitter:
+            departure += max(self.delay + self.rng.uniform(-self.jitter, self.jitter), 0)
+        if self.reorder and self.rng.random() < self.reorder:
+            counters["reordered"] += 1
+            departure += self.reorderGap
+        departures = [departure]
+        if self.duplicate and self.rng.random() < self.duplicate:
+            counters["duplicated"] += 1
+            departures.append(departure)
+        counters["forwarded"] += len(departures)
+        counters["bytes"] += size * len(departures)
+        return departures
+
+
+class Emulator:
+    def __init__(self, listen_port: int, receiver_port: int, loss: str = "0", reverse_loss: str = "0", delay: str = "0",
+                 jitter: str = "0", reorder: str = "0", reorder_gap: str = "5", duplicate: str = "0", rate: str = "0",
+                 queue: str = "0", seed: str = "1", stats: str = "") -> None:
+        '''
+        :param listen_port: the UDP port the sender sends its segments to.
+        :param receiver_port: the UDP port of the receiver.
+        :param loss: forward loss, a probability or ge:p:r[:bad[:good]] for Gilbert-Elliott bursts.
+        :param reverse_loss: the same for ACKs.
+        :param delay: one-way delay in milliseconds, both directions.
+        :param jitter: largest deviation from delay in milliseconds, both directions.
+        :param reorder: probability that a forward datagram is held back reorder_gap milliseconds.
+        :param duplicate: probability that a forward datagram is delivered twice.
+        :param rate: forward bottleneck in bits per second, 0 for none.
+        :param queue: bytes queued at the bottleneck before drop-tail, 0 for no limit.
+        :param seed: integer seed for every random choice.
+        :param stats: JSON file for the counters at exit, empty for none.
+        '''
+        self.address = "127.0.0.1"
+        self.receiverAddress = (self.address, int(receiver_port))
+        self.senderAddress = None  # learnt from the first segment
+        try:
+            seed = int(seed)
+        except ValueError:
+            raise ValueError(f"bad seed {seed!r}, expected an integer")
+        delay = parseAmount("delay", delay) / 1000
+        jitter = parseAmount("jitter", jitter) / 1000
+        forwardLoss = parseLoss(loss)
+        reverseLoss = parseLoss(reverse_loss)
+        self.forward = Link(random.Random(seed), forwardLoss, delay, jitter, parseProbability("reorder", reorder),
+                            parseAmount("reorder_gap", reorder_gap) / 1000, parseProbability("duplicate", duplicate),
+                            parseAmount("rate", rate) / 8, int(parseAmount("queue", queue)))
+        self.reverse = Link(random.Random(seed + 1), reverseLoss, delay, jitter)
+        self.statsFile = stats
+
+        self.front = socket.socket(family=socket.AF_INET, type=socket.SOCK_DGRAM)  # faces the sender
+        self.front.bind((self.address, int(listen_port)))
+        self.back = socket.socket(family=socket.AF_INET, type=socket.SOCK_DGRAM)  # faces the receiver
+        self.back.bind((self.address, 0))
+        for sock in (self.front, self.back):
+            enlargeBuffers(sock)
+            sock.setblocking(False)
+        self.pending = []  # heap of (departure, order, socket, datagram, address)
+        self.order = 0
+
+    def run(self):
+        selector = selectors.DefaultSelector()
+        selector.register(self.front, selectors.EVENT_READ)
+        selector.register(self.back, selectors.EVENT_READ)
+        signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+        try:
+            while True:
+                timeout = max(self.pending[0][0] - time.monotonic(), 0) if self.pending else None
+                for key, _ in selector.select(timeout):
+                    self.receive(key.fileobj)
+                self.release(time.monotonic())
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.report()
+
+    def receive(self, sock: socket.socket):
+        '''schedule every datagram waiting on sock'''
+        while True:
+            try:
+                datagram, address = sock.recvfrom(RECVBUFFER)
+            except (BlockingIOError, ConnectionRefusedError):
+                return
+            now = time.monotonic()
+            if sock is self.front:
+                self.senderAddress = address
+                link, out, destination = self.forward, self.back, self.receiverAddress
+            elif self.senderAddress is not None:
+                link, out, destination = self.reverse, self.front, self.senderAddress
+            else:
+                continue
+            for departure in link.admit(now, len(datagram)):
+                heapq.heappush(self.pending, (departure, self.order, out, datagram, destination))
+                self.order += 1
+
+    def release(self, now: float):
+        '''send every datagram whose departure time has come'''
+        while self.pending and self.pending[0][0] <= now:
+            _, _, out, datagram, destination = heapq.heappop(self.pending)
+            try:
+                out.sendto(datagram, destination)
+            except (BlockingIOError, ConnectionRefusedError):
+                pass  # a full socket buffer is one more loss
+
+    def stats(self) -> dict:
+        return {"forward": self.forward.counters, "reverse": self.reverse.counters}
+
+    def report(self):
+        stats = self.stats()
+        for direction, counters in stats.items():
+            print(f"{direction:8}" + "  ".join(f"{name}={value}" for name, value in counters.items()))
+        if self.statsFile:
+            with open(self.statsFile, "w") as file:
+                json.dump(stats, file, indent=1)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 3:
+        print(
+            "\n===== Error usage, python3 emulator.py listen_port receiver_port [--loss=P|ge:p:r[:bad[:good]]] [--reverse-loss=...] [--delay=ms] [--jitter=ms] [--reorder=P] [--reorder-gap=ms] [--duplicate=P] [--rate=bits/s] [--queue=bytes] [--seed=N] [--stats=file.json] ======\n")
+        exit(0)
+
+    emulator = Emulator(*sys.argv[1:3], **parseOptions(sys.argv[3:]))
+    emulator.run()
@@ -0,0 +1,178 @@
+"""
+    Forward error correction for the PTP Sender and Receiver
+    Python 3
+    Usage: python3 fec.py [iterations]   (micro-benchmark of encoding and rebuilding)
+    coding: utf-8
+
+    Notes:
+        DATA segments are numbered from the start of the file and cut into blocks
+        of K. Within a block, segment i belongs to parity group i % M, so each of
+        the M PARITY segments sent after the block is the XOR of every M-th
+        payload and any burst of up to M consecutive losses costs at most one
+        segment per group. A group with exactly one segment missing is rebuilt
+        by the receiver from the parity and the segments it has.
+
+        Payloads are XORed as Python integers (int.from_bytes, little-endian so
+        that a short last segment is zero-padded at its end), which runs the
+        whole payload through one C loop instead of a loop over bytes.
+
+        A PARITY segment carries the sequence number of the first segment of its
+        group. It takes no sequence space, is not acknowledged and is never
+        retransmitted.
+"""
+import sys
+import timeit
+from packet import PARITYHEADER
+
+
+def parseFec(text: str) -> tuple:
+    '''(K, M) from a --fec=K:M value'''
+    try:
+        k, m = (int(value) for value in text.split(":"))
+    except ValueError:
+        k = m = 0
+    if not 1 <= m <= k <= 255:
+        raise ValueError(f"bad fec {text!r}, expected off or K:M with 1 <= M <= K <= 255")
+    return k, m
+
+
+class ParityEncoder:
+    '''sender side: fold each new DATA payload into its group, hand out the parities once a block is complete'''
+    def __init__(self, k: int, m: int) -> None:
+        self.k = k
+        self.m = m
+        self.index = 0  # segments of the current block so far
+        self.groups = [None] * m  # [seqNo of the first segment, XOR, length XOR, count, longest payload]
+
+    def add(self, seqNo: int, payload) -> list:
+        '''(seqNo, payload) of the PARITY segments due after this DATA segment'''
+        group = self.groups[self.index % self.m]
+        value = int.from_bytes(payload, "little")
+        if group is None:
+            self.groups[self.index % self.m] = [seqNo, value, len(payload), 1, len(payload)]
+        else:
+            group[1] ^= value
+            group[2] ^= len(payload)
+            group[3] += 1
+            group[4] = max(group[4], len(payload))
+        self.index += 1
+        if self.index == self.k:
+            return self.flush()
+        return []
+
+    def flush(self) -> list:
+        '''parities of the block so far, e.g. the short last block of the file'''
+        parities = [(seqNo, PARITYHEADER.pack(count, lengthXor) + value.to_bytes(longest, "little"))
+                    for seqNo, value, lengthXor, count, longest in filter(None, self.groups)]
+        self.groups = [None] * self.m
+        self.index = 0
+        return parities
+
+
+class ParityDecoder:
+    '''
+    Receiver side. Every DATA segment received for the first time is folded
+    into its group by file offset; a group is rebuilt as soon as it has its
+    parity and all but one of its segments, and forgotten once the data before
+    the end of its block has been delivered in order.
+    '''
+    def __init__(self, k: int, m: int, size: int) -> None:
+        self.k = k
+        self.m = m
+        self.size = size  # every segment but the last of the file has this length
+        self.groups = {}  # (block, group) -> [XOR, length XOR, count, sum of indexes, parity]
+        self.resolved = set()  # groups already rebuilt or found complete
+        self.floor = 0  # blocks below this one are complete
+
+    def group(self, index: int):
+        key = (index // self.k, index % self.k % self.m)
+        if key[0] < self.floor or key in self.resolved:
+            return key, None
+        group = self.groups.get(key)
+        if group is None:
+            group = self.groups[key] = [0, 0, 0, 0, None]
+        return key, group
+
+    def add(self, offset: int, payload) -> tuple:
+        '''count a segment received for the first time; (offset, payload) of a segment it completes, or None'''
+        index = offset // self.size
+        key, group = self.group(index)
+        if group is None:
+            return None
+        group[0] ^= int.from_bytes(payload, "little")
+        group[1] ^= len(payload)
+        group[2] += 1
+        group[3] += index
+        return self.rebuild(key, group)
+
+    def parity(self, offset: int, content) -> tuple:
+        '''a PARITY segment whose group starts at offset; (offset, payload) of the segment it rebuilds, or None'''
+        if len(content) < PARITYHEADER.size:
+            return None
+        index = offset // self.size
+        key, group = self.group(index)
+        if group is None:
+            return None
+        count, lengthXor = PARITYHEADER.unpack_from(content)
+        value = int.from_bytes(content[PARITYHEADER.size:PARITYHEADER.size + self.size], "little")
+        group[4] = (index, count, lengthXor, value)
+        return self.rebuild(key, group)
+
+    def rebuild(self, key: tuple, group: list) -> tuple:
+        if group[4] is None:
+            return None
+        first, count, lengthXor, value = group[4]
+        if group[2] < count - 1:
+            return None  # more than one missing so far, a retransmission may still help
+        del self.groups[key]
+        self.resolved.add(key)
+        if group[2] >= count:
+            return None  # nothing missing
+        # the members are first, first + M, ... so the missing one is what their sum lacks
+        missing = count * first + self.m * count * (count - 1) // 2 - group[3]
+        length = lengthXor ^ group[1]
+        if (missing - first) % self.m or not first <= missing < first + count * self.m or not 0 < length <= self.size:
+            return None  # not a group this decoder can have produced
+        return missing * self.size, (value ^ group[0]).to_bytes(self.size, "little")[:length]
+
+    def prune(self, delivered: int):
+        '''forget the groups of blocks that lie entirely below delivered bytes'''
+        floor = delivered // (self.size * self.k)
+        if floor <= self.floor:
+            return
+        self.floor = floor
+        for key in [key for key in self.groups if key[0] < floor]:
+            del self.groups[key]
+        self.resolved = {key for key in self.resolved if key[0] >= floor}
+
+
+def benchmark(iterations: int, k: int = 8, m: int = 2, size: int = 1000):
+    '''cost of protecting one segment and of rebuilding a lost one'''
+    payloads = [memoryview(bytes([i]) * size) for i in range(k)]
+    encoder = ParityEncoder(k, m)
+
+    def encodeBlock():
+        for i, payload in enumerate(payloads):
+            encoder.add(i * size, payload)
+
+    def rebuildBlock():
+        decoder = ParityDecoder(k, m, size)
+        for i, payload in enumerate(payloads[1:], 1):
+            decoder.add(i * size, payload)
+        for j, (_, parity) in enumerate(parities):
+            decoder.parity(j * size, parity)
+
+    parities = []
+    for i, payload in enumerate(payloads):
+        parities += encoder.add(i * size, payload)
+    cases = [
+        (f"encode ({k}:{m}, {size} byte segments)", encodeBlock),
+        (f"decode with one loss per block", rebuildBlock),
+    ]
+    for name, case in cases:
+        seconds = min(timeit.repeat(case, number=iterations, repeat=5))
+        print(f"{name:40}{seconds / iterations / k * 1e9:10.0f} ns/segment")
+
+
+if __name__ == '__main__':
+    benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 10000)
@@ -0,0 +1,226 @@
+"""
+    Live metrics for the PTP Sender and Receiver
+    Python 3
+    Usage: python3 metrics.py unix:/tmp/sender.sock   (print one snapshot from a running program)
+    coding: utf-8
+
+    Notes:
+        --metrics=<file.json> rewrites a JSON snapshot every --metrics-interval
+        seconds (default 1) and once more at exit; --metrics=unix:<path> serves a
+        fresh snapshot to every client that connects to that UNIX socket instead.
+        A snapshot holds the counters and gauges each program reports (goodput,
+        bytes in flight, cwnd, RTO, reorder buffer depth, ...) and the histograms
+        (RTT, control_lock wait, reorder depth and, with --metrics-hooks=on, the
+        time spent in each hot-path method).
+        Nothing here runs unless --metrics is given.
+"""
+import json
+import os
+import socket
+import sys
+import threading
+import time
+
+
+class Histogram:
+    '''
+    Counts values in power-of-two buckets of value * scale, so recording is
+    one bit_length and an increment. With the default scale the buckets are
+    microseconds for values given in seconds.
+    '''
+    BUCKETS = 40
+
+    def __init__(self, scale: float = 1e6) -> None:
+        self.scale = scale
+        self.buckets = [0] * self.BUCKETS
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def record(self, value: float):
+        self.buckets[min(int(value * self.scale).bit_length(), self.BUCKETS - 1)] += 1
+        self.count += 1
+        self.total += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def percentile(self, q: float):
+        '''upper bound of the bucket holding the q-th percentile'''
+        if self.count == 0:
+            return None
+        rank = q / 100 * self.count
+        seen = 0
+        for i, n in enumerate(self.buckets):
+            seen += n
+            if seen >= rank:
+                return min((1 << i) / self.scale, self.max)
+        return self.max
+
+    def snapshot(self) -> dict:
+        return {
+            "count": self.count,
+            "mean": self.total / self.count if self.count else None,
+            "min": self.min,
+            "max": self.max,
+            "p50": self.percentile(50),
+            "p90": self.percentile(90),
+            "p99": self.percentile(99),
+        }
+
+
+class TimedLock:
+    '''threading.Lock that records how long every acquire waited; usable under threading.Condition'''
+    def __init__(self, histogram: Histogram) -> None:
+        self.lock = threading.Lock()
+        self.histogram = histogram
+
+    def acquire(self, blocking: bool = True, timeout: float = -1) -> bool:
+        if self.lock.acquire(False):
+            self.histogram.record(0)
+            return True
+        if not blocking:
+            return False
+        start = time.perf_counter()
+        acquired = self.lock.acquire(True, timeout)
+        self.histogram.record(time.perf_counter() - start)
+        return acquired
+
+    def release(self):
+        self.lock.release()
+
+    def locked(self) -> bool:
+        return self.lock.locked()
+
+    __enter__ = acquire
+
+    def __exit__(self, *args):
+        self.lock.release()
+
+
+class Metrics:
+    '''
+    Histograms plus named sources, callables that return a dict of current
+    counters and gauges. An exporter thread publishes snapshot() to a JSON
+    file or a UNIX socket. Sources are read without the owner's locks, so a
+    snapshot may mix values from either side of one ACK.
+    '''
+    def __init__(self, target: str, interval: float = 1.0) -> None:
+        self.target = target
+        self.interval = interval
+        self.histograms = {}
+        self.sources = {}
+        self.startTime = time.time()
+        self.stopped = threading.Event()
+        self.server = None
+        self.exporter = None
+
+    def histogram(self, name: str, scale: float = 1e6) -> Histogram:
+        if name not in self.histograms:
+            self.histograms[name] = Histogram(scale)
+        return self.histograms[name]
+
+    def observe(self, name: str, value: float):
+        self.histogram(name).record(value)
+
+    def addSource(self, name: str, source):
+        self.sources[name] = source
+
+    def timed(self, function, name: str):
+        '''wrap function so every call adds its duration to the histogram "hot.<name>"'''
+        histogram = self.histogram(f"hot.{name}")
+
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                histogram.record(time.perf_counter() - start)
+        return wrapper
+
+    def instrument(self, owner, names: list):
+        '''replace the named methods of one object with timed versions'''
+        for name in names:
+            setattr(owner, name, self.timed(getattr(owner, name), name))
+
+    def snapshot(self) -> dict:
+        now = time.time()
+        snapshot = {"time": now, "uptime": now - self.startTime}
+        for name, source in list(self.sources.items()):
+            snapshot[name] = source()
+        snapshot["histograms"] = {name: histogram.snapshot() for name, histogram in list(self.histograms.items())}
+        return snapshot
+
+    def start(self):
+        if self.target.startswith("unix:"):
+            path = self.target[len("unix:"):]
+            if os.path.exists(path):
+                os.unlink(path)
+            self.server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.server.bind(path)
+            self.server.listen()
+            self.server.settimeout(self.interval)
+            self.exporter = threading.Thread(target=self.serve, daemon=True)
+        else:
+            self.exporter = threading.Thread(target=self.publish, daemon=True)
+        self.exporter.start()
+
+    def publish(self):
+        while not self.stopped.wait(self.interval):
+            self.writeFile()
+
+    def writeFile(self):
+        '''replace the snapshot file atomically so readers never see half of one'''
+        temporary = f"{self.target}.tmp"
+        with open(temporary, "w") as file:
+            json.dump(self.snapshot(), file, indent=1)
+        os.replace(temporary, self.target)
+
+    def serve(self):
+        while not self.stopped.is_set():
+            try:
+                client, _ = self.server.accept()
+            except socket.timeout:
+                continue
+            except OSError:
+                return  # closed by stop()
+            with client:
+                client.sendall(json.dumps(self.snapshot()).encode())
+
+    def stop(self):
+        '''final snapshot for the file exporter; the socket goes away with the program'''
+        if self.stopped.is_set():
+            return
+        self.stopped.set()
+        if self.server is not None:
+            self.server.close()
+            os.unlink(self.target[len("unix:"):])
+        else:
+            self.writeFile()
+
+
+def openMetrics(target, interval: str):
+    '''Metrics for --metrics=<target>, or None when it is not set'''
+    return Metrics(target, float(interval)) if target else None
+
+
+def query(path: str) -> dict:
+    '''read one snapshot from a --metrics=unix:<path> endpoint'''
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        client.connect(path)
+        chunks = []
+        while True:
+            chunk = client.recv(65536)
+            if not chunk:
+                break
+            chunks.append(chunk)
+    return json.loads(b"".join(chunks))
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 2 or not sys.argv[1].startswith("unix:"):
+        print("\n===== Error usage, python3 metrics.py unix:/path/to/socket ======\n")
+        exit(0)
+    print(json.dumps(query(sys.argv[1][len("unix:"):]), indent=1))
@@ -0,0 +1,23 @@
+"""
+    Command line options shared by the PTP programs
+    Python 3
+    coding: utf-8
+
+    Notes:
+        sender.py, receiver.py, emulator.py and bench.py take their positional
+        arguments first and then any number of --name=value options, which are
+        handed to the constructor as keyword arguments: --rto-min=0.2 becomes
+        rto_min="0.2". Values stay strings; each constructor converts and
+        checks its own.
+"""
+
+
+def parseOptions(args: list) -> dict:
+    '''turn trailing --name=value arguments into keyword arguments for a constructor'''
+    options = {}
+    for arg in args:
+        if not arg.startswith("--") or "=" not in arg:
+            raise ValueError(f"bad option {arg!r}, expected --name=value")
+        name, value = arg[2:].split("=", 1)
+        options[name.replace("-", "_")] = value
+    return options
@@ -0,0 +1,158 @@
+"""
+    PTP segment format shared by the Sender and Receiver
+    Python 3
+    Usage: python3 packet.py [iterations]   (micro-benchmark of the per-packet cost)
+    coding: utf-8
+
+    Notes:
+        Version 1 headers are type(2) seqNo(2). Version 2 sets the high byte of
+        the type field to the version and carries type(1) seqNo(4) window(2), so
+        both can be told apart from the first byte of any datagram.
+
+        Headers are packed and parsed with precompiled struct.Struct objects and
+        the payload is handed out as a memoryview slice of the datagram, so
+        decoding copies nothing. An outgoing segment is a (header, payload)
+        tuple that sendmsg gathers in the kernel; the payload is never joined to
+        the header in user space. Receive buffers come from a BufferPool that is
+        allocated once and reused for every recv_into.
+"""
+import struct
+import sys
+import timeit
+
+DATA = 0
+ACK = 1
+SYN = 2
+FIN = 3
+RESET = 4
+PARITY = 5  # XOR of a group of DATA payloads, see fec.py
+TYPENAMES = {DATA: "DATA", ACK: "ACK", SYN: "SYN", FIN: "FIN", RESET: "RESET", PARITY: "PARITY"}
+MAXSEQNO = 65535
+MSS = 1000
+
+# header versions: 1 is the original type(2) seqNo(2); 2 sets the high byte of the
+# type field to the version and widens the rest to type(1) seqNo(4) window(2)
+HEADER_V1 = 1
+HEADER_V2 = 2
+SEQSPACE = {HEADER_V1: MAXSEQNO, HEADER_V2: 2 ** 32}
+V1 = struct.Struct("!HH")
+V2 = struct.Struct("!BBIH")
+HEADER = {HEADER_V1: V1, HEADER_V2: V2}
+HEADERSIZE = {version: header.size for version, header in HEADER.items()}
+SACKBLOCK = {2: struct.Struct("!HH"), 4: struct.Struct("!II")}  # by sequence number width
+
+# options carried as kind(1) length(1) value in the SYN payload and echoed in its ACK
+OPT_SACK = 1  # receiver may append SACK blocks to its ACKs
+OPT_WSCALE = 2  # one byte: left shift applied to the window field, version 2 only
+OPT_MSS = 3  # two bytes: largest DATA payload, the receiver answers with what it accepts
+OPT_FEC = 4  # two bytes: K data segments per block and M parity segments for each, echoed to accept
+OPT_COMPRESS = 5  # one byte: codec the DATA stream is compressed with (see compression.py), echoed to accept
+
+# PARITY payload: count(1) of DATA segments covered, XOR of their lengths(2), then the XOR of their payloads
+PARITYHEADER = struct.Struct("!BH")
+
+
+def encodeHeader(version: int, type: int, seqNo: int, window: int = 0) -> bytes:
+    if version == HEADER_V1:
+        return V1.pack(type, seqNo)
+    return V2.pack(version, type, seqNo, window)
+
+
+def encodeSegment(version: int, type: int, seqNo: int, payload=b"", window: int = 0) -> tuple:
+    '''(header, payload) buffers of one datagram, for sendmsg to gather'''
+    return (encodeHeader(version, type, seqNo, window), payload)
+
+
+def decodeHeader(content) -> tuple:
+    '''
+    (version, type, seqNo, window, payload view); version 1 has no window field.
+    None for a datagram shorter than its header or of an unknown version.
+    '''
+    view = memoryview(content)
+    if len(view) < V1.size:
+        return None
+    if view[0] == 0:
+        type, seqNo = V1.unpack_from(view)
+        return HEADER_V1, type, seqNo, None, view[V1.size:]
+    if view[0] != HEADER_V2 or len(view) < V2.size:
+        return None
+    version, type, seqNo, window = V2.unpack_from(view)
+    return version, type, seqNo, window, view[V2.size:]
+
+
+def encodeOptions(options: dict) -> bytes:
+    return b"".join(bytes((kind, len(value))) + value for kind, value in options.items())
+
+
+def decodeOptions(content) -> dict:
+    options = {}
+    i = 0
+    while i + 2 <= len(content):
+        kind, length = content[i], content[i + 1]
+        options[kind] = bytes(content[i + 2:i + 2 + length])
+        i += 2 + length
+    return options
+
+
+def encodeSack(blocks: list, width: int = 2) -> bytes:
+    '''ACK payload: one start/end pair of sequence numbers per block, width bytes each'''
+    return b"".join(SACKBLOCK[width].pack(start, end) for start, end in blocks)
+
+
+def decodeSack(content, width: int = 2) -> list:
+    '''(start, end) sequence ranges the receiver holds beyond the cumulative ACK'''
+    block = SACKBLOCK[width]
+    return list(block.iter_unpack(content[:len(content) - len(content) % block.size]))
+
+
+def seqBefore(a: int, b: int, space: int = MAXSEQNO) -> bool:
+    '''serial-number comparison: a comes before b in the wrapping sequence space'''
+    return 0 < (b - a) % space < space // 2
+
+
+class BufferPool:
+    '''
+    COUNT receive buffers allocated once and handed out in turn. A view into
+    one stays valid until the pool comes round to it again, so a whole read can
+    be parsed in place while the next one is already being received.
+    '''
+    COUNT = 4
+
+    def __init__(self, size: int, count: int = COUNT) -> None:
+        self.buffers = [bytearray(size) for _ in range(count)]
+        self.views = [memoryview(buffer) for buffer in self.buffers]
+        self.next = 0
+
+    def acquire(self) -> tuple:
+        '''(buffer, view) to receive into'''
+        i = self.next
+        self.next = (i + 1) % len(self.buffers)
+        return self.buffers[i], self.views[i]
+
+
+def benchmark(iterations: int):
+    '''compare the original bytearray conversions with the Struct/memoryview codec'''
+    payload = memoryview(bytes(MSS))
+    datagram = b"".join(encodeSegment(HEADER_V1, DATA, 12345, payload))
+
+    def originalDecode():
+        int.from_bytes(bytes(bytearray(datagram)[:2]), "big")
+        int.from_bytes(bytes(bytearray(datagram)[2:4]), "big")
+        bytes(bytearray(datagram)[4:])
+
+    def originalEncode():
+        bytes(bytearray(DATA.to_bytes(2, "big")) + bytearray((12345).to_bytes(2, "big")) + payload)
+
+    cases = [
+        ("decode (typeConv/seqNoConv/dataConv)", originalDecode),
+        ("decode (decodeHeader)", lambda: decodeHeader(datagram)),
+        ("encode (bytearray concatenation)", originalEncode),
+        ("encode (encodeSegment)", lambda: encodeSegment(HEADER_V1, DATA, 12345, payload)),
+    ]
+    for name, case in cases:
+        seconds = min(timeit.repeat(case, number=iterations, repeat=5))
+        print(f"{name:40}{seconds / iterations * 1e9:10.0f} ns/packet")
+
+
+if __name__ == '__main__':
+    benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
@@ -1,220 +1,936 @@
-"""
-    Sample code for Receiver
-    Python 3
-    Usage: python3 receiver.py receiver_port sender_port FileReceived.txt flp rlp
-    coding: utf-8
-
-    Notes:
-        Try to run the server first with the command:
-            python3 receiver_template.py 9000 10000 FileReceived.txt 1 1
-        Then run the sender:
-            python3 sender_template.py 11000 9000 FileToReceived.txt 1000 1
-
-    Author: Rui Li (Tutor for COMP3331/9331)
-"""
-# here are the libs you may find it useful:
-import datetime, time  # to calculate the time delta of packet transmission
-import logging, sys  # to write the log
-import socket  # Core lib, to send packet via UDP socket
-from threading import Thread  # (Optional)threading will make the timer easily implemented
-import random  # for flp and rlp function
-
-BUFFERSIZE = 1024
-DATA = 0
-ACK = 1
-SYN = 2
-FIN = 3
-RESET = 4
-MAXSEQNO = 65535
-MSS = 1000
-
-
-class Receiver:
-    def __init__(self, receiver_port: int, sender_port: int, filename: str, flp: float, rlp: float) -> None:
-        '''
-        The server will be able to receive the file from the sender via UDP
-        :param receiver_port: the UDP port number to be used by the receiver to receive PTP segments from the sender.
-        :param sender_port: the UDP port number to be used by the sender to send PTP segments to the receiver.
-        :param filename: the name of the text file into which the text sent by the sender should be stored
-        :param flp: forward loss probability, which is the probability that any segment in the forward direction (Data, FIN, SYN) is lost.
-        :param rlp: reverse loss probability, which is the probability of a segment in the reverse direction (i.e., ACKs) being lost.
-
-        '''
-        self.address = "127.0.0.1"  # change it to 0.0.0.0 or public ipv4 address if want to test it between different computers
-        self.receiver_port = int(receiver_port)
-        self.sender_port = int(sender_port)
-        self.server_address = (self.address, self.receiver_port)
-        self.sender_address = (self.address, self.sender_port)
-
-        random.seed()
-        self.receiver_port = receiver_port
-        self.sender_port = sender_port
-        self.fileName = filename
-        self.flp = float(flp)
-        self.rlp = float(rlp)
-        self.packetBuffer = []
-        self.lastACKNo = 0  
-        self.dataReceived = 0
-        self.segmentsReceived = 0
-        self.dupSegReceived = 0
-        self.dataSegDropped = 0
-        self.ackSegDropped = 0
-
-        # init the UDP socket
-        # define socket for the server side and bind address
-        self.receiver_socket = socket.socket(family=socket.AF_INET, type=socket.SOCK_DGRAM)
-        self.receiver_socket.bind(self.server_address)
-        pass
-
-    def run(self) -> None:
-        '''
-        This function contain the main logic of the receiver
-        '''
-        openCon = False
-        firstrun = True
-        while openCon == False:
-            incoming_message, sender_address = self.receiver_socket.recvfrom(BUFFERSIZE)
-            if firstrun: self.startTime = time.time()
-            firstrun = False
-            sendTime = round((time.time() - self.startTime) * 100, 2)
-            type = self.typeConv(incoming_message)
-            if type != SYN: exit(0)
-            typestr = "SYN"
-            seqNo = self.seqNoConv(incoming_message)
-            data = self.dataConv(incoming_message)
-            if random.random() > self.flp:            
-                self.lastACKNo = (seqNo + len(data) + 1) % MAXSEQNO
-                logging.info(f"rcv\t{sendTime:8}\t{typestr:4}\t{seqNo:8}\t{0:4}")
-                self.sendPacket(self.lastACKNo, ACK)
-                openCon = True
-            else:
-                logging.info(f"drp\t{sendTime:8}\t{typestr:4}\t{seqNo:8}\t{0:4}")
-            file = open(self.fileName, "wb")
-        
-        while True:
-            incoming_message, sender_address = self.receiver_socket.recvfrom(BUFFERSIZE)
-            type = self.typeConv(incoming_message)
-            if type == DATA: typestr = "DATA"
-            if type == ACK: typestr = "ACK"
-            if type == SYN: typestr = "SYN"
-            if type == FIN: typestr = "FIN"
-            if type == RESET: typestr = "RESET" 
-            seqNo = self.seqNoConv(incoming_message)
-            data = self.dataConv(incoming_message)
-            sendTime = round((time.time() - self.startTime) * 100, 2)
-
-            if random.random() > self.flp or type == RESET:
-                if seqNo % MAXSEQNO == self.lastACKNo:
-                    if type == DATA:
-                        file.write(data)
-                        self.segmentsReceived += 1
-                        self.dataReceived += len(data)
-                        self.lastACKNo = (seqNo + len(data)) % MAXSEQNO
-                        self.processBuffer(file)    
-                    elif type == FIN:
-                        self.lastACKNo = (seqNo + len(data)) % MAXSEQNO
-                        logging.info(f"rcv\t{sendTime:8}\t{typestr:4}\t{seqNo:8}\t{len(data):4}")
-                        self.sendPacket(((seqNo + len(data) + 1) % MAXSEQNO), ACK)
-                        break
-                    elif type == RESET or type == SYN:
-                        logging.info(f"rcv\t{sendTime:8}\t{typestr:4}\t{seqNo:8}\t{len(data):4}")
-                        exit(0)
-                        pass
-                else:
-                    if seqNo < self.lastACKNo or [seqNo, data, incoming_message] in self.packetBuffer:
-                        self.dupSegReceived += 1
-                    self.packetBuffer.append([seqNo, data, incoming_message])
-                logging.info(f"rcv\t{sendTime:8}\t{typestr:4}\t{seqNo:8}\t{len(data):4}")
-                    
-                # reply "ACK" once receive any message from sender
-                self.sendPacket((self.lastACKNo), ACK)
-            else:
-                if type == DATA:
-                    self.dataSegDropped += 1
-                logging.info(f"drp\t{sendTime:8}\t{typestr:4}\t{seqNo:8}\t{len(data):4}")
-        #close
-        endTime = time.time() + 2
-        while (time.time() < endTime):
-            self.receiver_socket.settimeout(endTime - time.time())
-            try:
-                incoming_message, sender_address = self.receiver_socket.recvfrom(BUFFERSIZE)
-                type = self.typeConv(incoming_message)
-                seqNo = self.seqNoConv(incoming_message)
-                data = self.dataConv(incoming_message)
-                sendTime = round((time.time() - self.startTime) * 100, 2)
-                if random.random() > self.flp and type == FIN:
-                    logging.info(f"rcv\t{sendTime:8}\t{typestr:4}\t{seqNo:8}\t{len(data):4}")
-                    self.sendPacket(((seqNo + len(data) + 1) % MAXSEQNO), ACK)
-                else:
-                    if type == DATA:
-                        self.dataSegDropped += 1
-                    logging.info(f"drp\t{sendTime:8}\t{typestr:4}\t{seqNo:8}\t{0:4}")
-            except:
-                pass
-        logging.info(f"Amount of (original) Data Received (in bytes) – does not include retransmitted data:\t{self.dataReceived}")
-        logging.info(f"Number of (original) Data Segments Received – does not include retransmitted data:\t{self.segmentsReceived}")
-        logging.info(f"Number of duplicate segments received (if any):\t{self.dupSegReceived}")
-        logging.info(f"Number of Data segments dropped:\t{self.dataSegDropped}")
-        logging.info(f"Number of ACK segments dropped:\t{self.ackSegDropped}")
-        file.close()
-        exit(0)
-
-    def sendPacket(self, seqNo: int, type: int):
-        formType = bytearray(type.to_bytes(2, "big"))
-        formSeqNo = bytearray(seqNo.to_bytes(2, "big"))
-        message = bytes(formType + formSeqNo)
-        sendTime = round((time.time() - self.startTime) * 100, 2)
-        if type == DATA: typestr = "DATA"
-        if type == ACK: typestr = "ACK"
-        if type == SYN: typestr = "SYN"
-        if type == FIN: typestr = "FIN"
-        if type == RESET: typestr = "RESET"
-        if random.random() > self.rlp:
-            logging.info(f"snd\t{sendTime:8}\t{typestr:4}\t{seqNo:8}\t{0:4}")
-            self.receiver_socket.sendto(message, self.sender_address)
-        else :
-            if type == ACK:
-                self.ackSegDropped += 1
-            logging.info(f"snd\t{sendTime:8}\t{typestr:4}\t{seqNo:8}\t{0:4}")
-
-    def typeConv(self, content: bytes) -> int:
-        return int.from_bytes(bytes(bytearray(content)[:2]), "big")
-
-    def seqNoConv(self, content: bytes) -> int:
-        return int.from_bytes(bytes(bytearray(content)[2:4]), "big")
-
-    def dataConv(self, content: bytes) -> bytes:
-        return bytes(bytearray(content)[4:])
-
-    def processBuffer(self, file):
-        for packet in self.packetBuffer:
-            if (self.lastACKNo > packet[0]):
-                self.packetBuffer.remove(packet)
-                continue
-            if (self.lastACKNo == packet[0]  or self.lastACKNo + 1 == packet[0]):
-                file.write(packet[1])
-                self.segmentsReceived += 1
-                self.dataReceived += len(packet[1])
-                self.lastACKNo = (packet[0] + len(packet[1])) % MAXSEQNO
-                self.packetBuffer.remove(packet)
-                self.processBuffer(file) 
-                break;   
-
-            
-
-
-if __name__ == '__main__':
-    # logging is useful for the log part: https://docs.python.org/3/library/logging.html
-    logging.basicConfig(
-        filename="Receiver_log.txt",
-        filemode="w",
-        format="%(message)s",
-        level=logging.NOTSET)
-
-    if len(sys.argv) != 6:
-        print(
-            "\n===== Error usage, python3 receiver.py receiver_port sender_port FileReceived.txt flp rlp ======\n")
-        exit(0)
-
-    receiver = Receiver(*sys.argv[1:])
-    receiver.run()
\ No newline at end of file
+"""
+    Sample code for Receiver
+    Python 3
+    Usage: python3 receiver.py receiver_port sender_port FileReceived.txt flp rlp [--engine=thread|asyncio] [--fsync=none|close|<bytes>]
+           [--sessions=N] [--workers=N] [--sack=on|off] [--rwnd=bytes]
+           [--mss=bytes] [--batch=on|off] [--log=text|trace|stats]
+           [--metrics=file.json|unix:path] [--metrics-interval=seconds] [--metrics-hooks=on|off]
+           [--seed=N] [--ack-every=N] [--ack-delay=seconds] [--fec=on|off]
+           [--compress=on|off] [--idle-timeout=seconds]
+    coding: utf-8
+
+    Notes:
+        Try to run the server first with the command:
+            python3 receiver_template.py 9000 10000 FileReceived.txt 1 1
+        Then run the sender:
+            python3 sender_template.py 11000 9000 FileToReceived.txt 1000 1
+
+        --engine=asyncio drives the same segment handling from a loop.add_reader
+        callback, which reads and acknowledges in batches like the thread engine,
+        and ends the 2 second FIN wait with loop.call_later instead of a socket timeout.
+
+        Segments are written straight to their offset in FileReceived.txt, in or
+        out of order, so a gap costs no memory. --fsync chooses when the data is
+        forced to disk: never (default), on close, or after every <bytes> written.
+
+        --sessions=N accepts N transfers (0: no limit) from any number of senders at
+        once. Sessions are keyed by source address and SYN sequence number, and each
+        writes FileReceived-<host>_<port>-<isn>.txt and Receiver_log-<host>_<port>-<isn>.txt.
+        A SYN with a new sequence number replaces the session of its address, e.g.
+        when a sender is restarted on the same port.
+        --workers=N runs N such receivers in separate processes on one SO_REUSEPORT
+        port (requires --sessions=0, stop with Ctrl-C).
+        With more than one session, a session that hears nothing from its sender
+        for --idle-timeout seconds (default 120, above the sender's largest RTO;
+        0 never) is dropped with its file and log, as if the sender had reset.
+
+        If the SYN offers SACK (and --sack is on, the default) every ACK carries
+        up to four start/end blocks describing buffered out-of-order data. The
+        ACK of a duplicate DATA segment puts the duplicate range first (D-SACK,
+        RFC 2883), which tells the sender that its retransmission was not needed.
+
+        Each session answers in the header version of its SYN. Version 2 headers
+        carry 32-bit sequence numbers and a 16-bit receive window; --rwnd (default
+        64 MB) is advertised there, scaled by the shift agreed in the SYN exchange.
+
+        The segment size offered in the SYN is accepted up to --mss (default: the
+        largest that fits a datagram). With --batch=on (the default) both engines
+        read with UDP GRO through batchio.BatchReceiver and send the ACKs for
+        one read as a single GSO batch.
+
+        --log=trace records packet events in Receiver_trace.bin (one per session,
+        named like the logs) for "python3 tracelog.py" to render later, and
+        --log=stats writes only the statistics; see tracelog.py.
+
+        --metrics publishes per-session counters, goodput and reorder buffer depth
+        while transfers run, as a JSON file or on a UNIX socket (see metrics.py);
+        with --workers each process appends its pid to the target. --metrics-hooks=on
+        also times dispatch, handleSegment and processBuffer.
+
+        flp and rlp drop segments independently at random. --seed=N makes the
+        drop pattern repeatable (each --workers process adds its index); for
+        delay, reordering, burst loss or a rate limit run emulator.py in front of
+        the receiver with flp and rlp set to 0.
+
+        In-order, full-sized DATA segments are acknowledged together: one
+        cumulative ACK per --ack-every=N of them (default 2), or sooner when no
+        more segments are waiting to be read, and never later than --ack-delay
+        seconds (default 0.005). Out-of-order, gap-filling, duplicate and short
+        segments, SYN and FIN are still answered at once, so the sender sees
+        its duplicate ACKs and SACK blocks without delay. --ack-every=1 sends an
+        ACK for every segment as before.
+
+        When the SYN offers forward error correction (sender --fec=K:M) and --fec
+        is on (the default), PARITY segments are used to rebuild a lost DATA
+        segment as soon as the rest of its group is in (see fec.py). The rebuilt
+        segment is then handled as if it had arrived, so it is ACKed like one.
+
+        A compressed stream (sender --compress) is accepted when --compress is on
+        (the default) and the codec is installed. Its segments are decompressed
+        as they become contiguous, so out-of-order ones are held in memory rather
+        than written ahead, and the statistics count compressed bytes.
+
+    Author: Rui Li (Tutor for COMP3331/9331)
+"""
+# here are the libs you may find it useful:
+import datetime, time  # to calculate the time delta of packet transmission
+import logging, sys  # to write the log
+import socket  # Core lib, to send packet via UDP socket
+from threading import Thread  # (Optional)threading will make the timer easily implemented
+import random  # for flp and rlp function
+import asyncio  # event-driven engine, selected with --engine=asyncio
+import os  # positional writes for the output file
+import multiprocessing  # --workers: one receiver process per core
+from batchio import BatchSender, BatchReceiver, MAXDATAGRAM, enlargeBuffers  # GSO/GRO batched socket I/O
+from metrics import openMetrics  # live JSON snapshots, histograms and hot-path timing
+from tracelog import openEventLog, SND, RCV, DRP  # text, binary trace or statistics-only event log
+from fec import ParityDecoder  # rebuilds lost DATA from PARITY segments
+from compression import StreamDecompressor, available  # zlib/lzma/zstd stream
+from packet import (DATA, ACK, SYN, FIN, RESET, PARITY, MAXSEQNO, MSS, HEADER_V1, HEADER_V2, SEQSPACE, HEADERSIZE,
+                    OPT_SACK, OPT_WSCALE, OPT_MSS, OPT_FEC, OPT_COMPRESS, encodeSegment, decodeHeader, encodeOptions, decodeOptions,
+                    encodeSack, seqBefore)  # segment format shared with the sender
+from options import parseOptions  # --name=value arguments
+
+MAXWINDOWFIELD = 0xFFFF
+MAXWSCALE = 14
+MAXSACKBLOCKS = 4
+
+# connection states driven by handleSegment
+LISTEN = 0
+ESTABLISHED = 1
+TIME_WAIT = 2
+CLOSED = 3
+TIME_WAIT_SECONDS = 2
+
+
+class ReassemblyBuffer:
+    '''
+    Out-of-order DATA segments keyed by their sequence number. The payload is
+    already on disk at its final offset, so only the length is kept. Insert,
+    duplicate check and the pop used to drain in-order data are single dict
+    operations, and keys stay valid across the wrap of the sequence space because
+    nothing is compared by size.
+
+    Contiguous runs of buffered segments are also kept as ranges, indexed by
+    both edges so that a new segment merges with its neighbours in O(1); these
+    are the SACK blocks.
+    '''
+    def __init__(self, space: int = MAXSEQNO) -> None:
+        self.space = space
+        self.segments = {}
+        self.starts = {}  # range start -> range end
+        self.ends = {}  # range end -> range start
+        self.recent = None  # start of the range that took the latest segment
+
+    def __len__(self) -> int:
+        return len(self.segments)
+
+    def add(self, seqNo: int, length: int) -> bool:
+        '''record a segment; False if that sequence number is already held'''
+        if seqNo in self.segments:
+            return False
+        self.segments[seqNo] = length
+        start, end = seqNo, (seqNo + length) % self.space
+        if end in self.starts:
+            end = self.starts.pop(end)
+        if start in self.ends:
+            start = self.ends.pop(start)
+            del self.starts[start]
+        self.starts[start] = end
+        self.ends[end] = start
+        self.recent = start
+        return True
+
+    def pop(self, seqNo: int):
+        '''length of the segment starting at seqNo, or None if it has not arrived'''
+        length = self.segments.pop(seqNo, None)
+        if length is None:
+            return None
+        # the next in-order segment always starts a range
+        end = self.starts.pop(seqNo)
+        start = (seqNo + length) % self.space
+        if start == end:
+            del self.ends[end]
+            start = None
+        else:
+            self.starts[start] = end
+            self.ends[end] = start
+        if self.recent == seqNo:
+            self.recent = start
+        return length
+
+    def blocks(self, limit: int) -> list:
+        '''up to limit (start, end) ranges, the most recently extended one first'''
+        blocks = []
+        if self.recent is not None:
+            blocks.append((self.recent, self.starts[self.recent]))
+        for start, end in self.starts.items():
+            if len(blocks) >= limit:
+                break
+            if start != self.recent:
+                blocks.append((start, end))
+        return blocks
+
+
+def parseFsync(text: str) -> int:
+    '''bytes between fsyncs for a --fsync value, 0 for none and close'''
+    if text in ("none", "close"):
+        return 0
+    if not text.isdigit() or int(text) == 0:
+        raise ValueError(f"bad fsync policy {text!r}, expected none, close or a positive byte count")
+    return int(text)
+
+
+class OutputSink:
+    '''
+    Output file written by offset. Segments that continue the current run are
+    appended to it in memory and go to disk in one pwrite once the run reaches
+    COALESCE bytes or something non-adjacent arrives. The file is preallocated in
+    PREALLOCATE steps where the filesystem supports it and trimmed on close.
+    '''
+    COALESCE = 256 * 1024
+    PREALLOCATE = 8 * 1024 * 1024
+
+    def __init__(self, fileName: str, fsync: str = "none") -> None:
+        self.fsyncEvery = parseFsync(fsync)
+        self.fsync = fsync
+        self.fd = os.open(fileName, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, "O_BINARY", 0), 0o666)
+        self.run = bytearray()
+        self.runOffset = 0
+        self.end = 0  # one past the highest byte written
+        self.allocated = 0
+        self.unsynced = 0
+
+    def write(self, offset: int, data: bytes):
+        if self.run and offset != self.runOffset + len(self.run):
+            self.flush()
+        if not self.run:
+            self.runOffset = offset
+        self.run += data
+        if len(self.run) >= self.COALESCE:
+            self.flush()
+
+    def flush(self):
+        if not self.run:
+            return
+        end = self.runOffset + len(self.run)
+        self.preallocate(end)
+        if hasattr(os, "pwrite"):
+            os.pwrite(self.fd, self.run, self.runOffset)
+        else:
+            os.lseek(self.fd, self.runOffset, os.SEEK_SET)
+            os.write(self.fd, self.run)
+        self.end = max(self.end, end)
+        self.unsynced += len(self.run)
+        self.run.clear()
+        if self.fsyncEvery and self.unsynced >= self.fsyncEvery:
+            os.fsync(self.fd)
+            self.unsynced = 0
+
+    def preallocate(self, end: int):
+        if end <= self.allocated or not hasattr(os, "posix_fallocate"):
+            return
+        size = (end // self.PREALLOCATE + 1) * self.PREALLOCATE
+        try:
+            os.posix_fallocate(self.fd, self.allocated, size - self.allocated)
+            self.allocated = size
+        except OSError:
+            self.allocated = float("inf")  # not supported here, just let writes extend the file
+
+    def close(self):
+        self.flush()
+        os.ftruncate(self.fd, self.end)
+        if self.fsync != "none":
+            os.fsync(self.fd)
+        os.close(self.fd)
+
+
+class Session:
+    '''
+    One transfer from one sender, identified by its source address and the
+    sequence number of its SYN. It owns the output file, the reassembly state and
+    the statistics; the Receiver owns the socket and routes datagrams here.
+    '''
+    def __init__(self, receiver, address: tuple, isn: int, fileName: str, log: logging.Logger, events, version: int = HEADER_V1) -> None:
+        self.receiver = receiver
+        self.address = address
+        self.isn = isn
+        self.fileName = fileName
+        self.log = log
+        self.events = events  # per-packet events and statistics, see tracelog.py
+        self.version = version  # header version of the SYN, used for every reply
+        self.seqSpace = SEQSPACE[version]
+        self.packetBuffer = ReassemblyBuffer(self.seqSpace)
+        self.lastACKNo = 0
+        self.dataReceived = 0
+        self.segmentsReceived = 0
+        self.dupSegReceived = 0
+        self.dataSegDropped = 0
+        self.ackSegDropped = 0
+
+        self.state = LISTEN
+        self.startTime = time.time()
+        self.file = None
+        self.closeTime = 0
+        self.options = {}  # options accepted from the SYN, echoed in its ACK
+        self.sack = False
+        self.duplicate = None  # (start, end) of a duplicate DATA segment for the next ACK's D-SACK block
+        self.windowShift = 0  # agreed through OPT_WSCALE
+        self.mss = MSS  # full segment size, agreed through OPT_MSS
+        self.unacked = 0  # in-order segments covered by the delayed ACK
+        self.ackDeadline = None  # when the delayed ACK has to go out, None if there is none
+        self.acksSent = 0
+        self.fec = None  # ParityDecoder once OPT_FEC is accepted
+        self.fecRecovered = 0
+        self.decompressor = None  # StreamDecompressor once OPT_COMPRESS is accepted
+        self.held = {}  # compressed stream: out-of-order payloads by seqNo until they can be decompressed
+        self.written = 0  # compressed stream: bytes of decompressed output
+        self.closeHandle = None  # asyncio engine: call_later handle that ends TIME_WAIT
+        self.lastHeard = self.startTime  # arrival of the latest datagram, for --idle-timeout
+
+    def handleSegment(self, type: int, seqNo: int, data: bytes) -> None:
+        '''process one datagram according to the connection state'''
+        self.lastHeard = time.time()
+        if self.state == LISTEN:
+            self.handleOpen(type, seqNo, data)
+        elif self.state == ESTABLISHED:
+            self.handleData(type, seqNo, data)
+        elif self.state == TIME_WAIT:
+            self.handleTimeWait(type, seqNo, data)
+
+    def handleOpen(self, type: int, seqNo: int, data: bytes) -> None:
+        elapsed = time.time() - self.startTime
+        if type != SYN:
+            self.events.packet(RCV, type, seqNo, len(data), elapsed)
+            self.abort()
+            return
+        if random.random() > self.receiver.flp:
+            # SYN options do not use sequence space, the SYN itself takes one number
+            self.lastACKNo = (seqNo + 1) % self.seqSpace
+            self.negotiate(decodeOptions(data))
+            self.events.packet(RCV, SYN, seqNo, 0, elapsed)
+            self.sendPacket(self.lastACKNo, ACK, encodeOptions(self.options))
+            self.file = OutputSink(self.fileName, self.receiver.fsync)
+            self.state = ESTABLISHED
+        else:
+            self.events.packet(DRP, SYN, seqNo, 0, elapsed)
+
+    def negotiate(self, offered: dict) -> None:
+        '''accept the SYN options this receiver supports'''
+        if OPT_SACK in offered and self.receiver.sack:
+            self.options[OPT_SACK] = b""
+            self.sack = True
+        if OPT_WSCALE in offered and self.version == HEADER_V2:
+            self.windowShift = self.receiver.windowShift
+            self.options[OPT_WSCALE] = bytes((self.windowShift,))
+        if OPT_MSS in offered:
+            mss = min(int.from_bytes(offered[OPT_MSS], "big"), self.receiver.mss, MAXDATAGRAM - HEADERSIZE[self.version])
+            self.options[OPT_MSS] = mss.to_bytes(2, "big")
+            self.mss = mss
+        if OPT_FEC in offered and self.receiver.fec and len(offered[OPT_FEC]) == 2 and 1 <= offered[OPT_FEC][1] <= offered[OPT_FEC][0]:
+            k, m = offered[OPT_FEC]
+            self.fec = ParityDecoder(k, m, self.mss)
+            self.options[OPT_FEC] = offered[OPT_FEC]
+        if OPT_COMPRESS in offered and self.receiver.compress and len(offered[OPT_COMPRESS]) == 1 and available(offered[OPT_COMPRESS][0]):
+            self.decompressor = StreamDecompressor(offered[OPT_COMPRESS][0])
+            self.options[OPT_COMPRESS] = offered[OPT_COMPRESS]
+
+    def window(self) -> int:
+        '''window field for version 2 headers'''
+        return min(self.receiver.rwnd >> self.windowShift, MAXWINDOWFIELD)
+
+    def handleData(self, type: int, seqNo: int, data: bytes) -> None:
+        elapsed = time.time() - self.startTime
+
+        if random.random() > self.receiver.flp or type == RESET:
+            self.acceptSegment(type, seqNo, data, elapsed)
+        else:
+            if type == DATA:
+                self.dataSegDropped += 1
+            self.events.packet(DRP, type, seqNo, len(data), elapsed)
+
+    def acceptSegment(self, type: int, seqNo: int, data: bytes, elapsed: float) -> None:
+        '''a segment that survived flp, or one rebuilt from parity'''
+        if type == PARITY:
+            self.events.packet(RCV, type, seqNo, len(data), elapsed)
+            if self.fec is not None:
+                self.rebuild(self.fec.parity(self.offsetOf(seqNo), data), elapsed)
+            return  # PARITY is not in the sequence space, an ACK would only look like a duplicate
+        delayable = False
+        rebuilt = None
+        if seqNo % self.seqSpace == self.lastACKNo:
+            if type == DATA:
+                # nothing buffered beyond it: the ACK neither fills a gap nor carries SACK news
+                delayable = not self.packetBuffer and len(data) >= self.mss
+                if self.fec is not None:
+                    rebuilt = self.fec.add(self.dataReceived, data)
+                self.deliver(data)
+                self.segmentsReceived += 1
+                self.dataReceived += len(data)
+                self.lastACKNo = (seqNo + len(data)) % self.seqSpace
+                self.processBuffer(self.file)
+                if self.fec is not None:
+                    self.fec.prune(self.dataReceived)
+            elif type == FIN:
+                self.lastACKNo = (seqNo + len(data)) % self.seqSpace
+                self.events.packet(RCV, type, seqNo, len(data), elapsed)
+                if self.decompressor is not None:
+                    self.writeOutput(self.decompressor.flush())
+                self.clearDelayedAck()
+                self.sendPacket(((seqNo + len(data) + 1) % self.seqSpace), ACK)
+                self.state = TIME_WAIT
+                self.closeTime = time.time() + TIME_WAIT_SECONDS
+                if self.receiver.engine == "asyncio":
+                    self.closeHandle = asyncio.get_running_loop().call_later(TIME_WAIT_SECONDS, self.finish)
+                return
+            elif type == RESET:
+                self.events.packet(RCV, type, seqNo, len(data), elapsed)
+                self.abort()
+                return
+        elif type == SYN and seqNo == self.isn and self.lastACKNo == (self.isn + 1) % self.seqSpace:
+            # our SYN-ACK was lost: repeat it, options included, before any data
+            self.events.packet(RCV, type, seqNo, 0, elapsed)
+            self.sendPacket(self.lastACKNo, ACK, encodeOptions(self.options))
+            return
+        elif type == DATA:
+            if seqBefore(seqNo, self.lastACKNo, self.seqSpace) or not self.packetBuffer.add(seqNo, len(data)):
+                self.dupSegReceived += 1
+                self.duplicate = (seqNo, (seqNo + len(data)) % self.seqSpace)
+            else:
+                if self.receiver.metrics is not None:
+                    self.receiver.metrics.histogram("reorderDepth", 1).record(len(self.packetBuffer))
+                # write it at its final offset now; processBuffer only counts it later
+                offset = self.offsetOf(seqNo)
+                if self.fec is not None:
+                    rebuilt = self.fec.add(offset, data)
+                if self.decompressor is None:
+                    self.file.write(offset, data)
+                else:
+                    self.held[seqNo] = bytes(data)  # the receive buffer is reused
+        self.events.packet(RCV, type, seqNo, len(data), elapsed)
+
+        if delayable:
+            self.delayAck()
+        else:
+            self.sendAck()
+        self.rebuild(rebuilt, elapsed)
+
+    def deliver(self, data) -> None:
+        '''the next in-order piece of the stream'''
+        if self.decompressor is None:
+            self.file.write(self.dataReceived, data)
+        else:
+            self.writeOutput(self.decompressor.decompress(data))
+
+    def writeOutput(self, output: bytes) -> None:
+        self.file.write(self.written, output)
+        self.written += len(output)
+
+    def offsetOf(self, seqNo: int) -> int:
+        '''file offset of a sequence number less than half the space away from lastACKNo'''
+        if seqBefore(seqNo, self.lastACKNo, self.seqSpace):
+            return self.dataReceived - (self.lastACKNo - seqNo) % self.seqSpace
+        return self.dataReceived + (seqNo - self.lastACKNo) % self.seqSpace
+
+    def rebuild(self, rebuilt: tuple, elapsed: float) -> None:
+        '''take a segment recovered from parity as if it had just arrived'''
+        if rebuilt is None:
+            return
+        offset, data = rebuilt
+        if offset < self.dataReceived:
+            return
+        self.fecRecovered += 1
+        self.acceptSegment(DATA, (self.lastACKNo + offset - self.dataReceived) % self.seqSpace, data, elapsed)
+
+    def sendAck(self) -> None:
+        '''cumulative ACK now, with SACK blocks if agreed; it covers any delayed one'''
+        self.clearDelayedAck()
+        blocks = self.packetBuffer.blocks(MAXSACKBLOCKS) if self.sack else []
+        if self.duplicate is not None:
+            if self.sack:
+                blocks = [self.duplicate] + blocks[:MAXSACKBLOCKS - 1]
+            self.duplicate = None
+        self.sendPacket((self.lastACKNo), ACK, encodeSack(blocks, 2 if self.version == HEADER_V1 else 4))
+
+    def delayAck(self) -> None:
+        '''count an in-order segment towards the next ACK; the Receiver sends it when its reads run dry'''
+        self.unacked += 1
+        if self.unacked >= self.receiver.ackEvery:
+            self.sendAck()
+        elif self.ackDeadline is None:
+            self.ackDeadline = time.time() + self.receiver.ackDelay
+            self.receiver.pendingAcks.append(self)
+
+    def flushAck(self) -> None:
+        '''send the delayed ACK, if it is still owed'''
+        if self.ackDeadline is not None and self.state == ESTABLISHED:
+            self.sendAck()
+
+    def clearDelayedAck(self) -> None:
+        self.unacked = 0
+        if self.ackDeadline is not None:
+            self.ackDeadline = None
+            self.receiver.pendingAcks.remove(self)
+
+    def handleTimeWait(self, type: int, seqNo: int, data: bytes) -> None:
+        '''answer retransmitted FINs until the 2 second close timer runs out'''
+        elapsed = time.time() - self.startTime
+        if random.random() > self.receiver.flp and type == FIN:
+            self.events.packet(RCV, FIN, seqNo, len(data), elapsed)
+            self.sendPacket(((seqNo + len(data) + 1) % self.seqSpace), ACK)
+        else:
+            if type == DATA:
+                self.dataSegDropped += 1
+            self.events.packet(DRP, FIN, seqNo, 0, elapsed)
+
+    def finish(self) -> None:
+        '''TIME_WAIT expired: write the statistics and release the output file'''
+        if self.state == CLOSED:
+            return
+        self.events.info(f"Amount of (original) Data Received (in bytes) – does not include retransmitted data:\t{self.dataReceived}")
+        self.events.info(f"Number of (original) Data Segments Received – does not include retransmitted data:\t{self.segmentsReceived}")
+        self.events.info(f"Number of duplicate segments received (if any):\t{self.dupSegReceived}")
+        self.events.info(f"Number of Data segments dropped:\t{self.dataSegDropped}")
+        self.events.info(f"Number of ACK segments dropped:\t{self.ackSegDropped}")
+        if self.decompressor is not None:
+            self.events.info(f"Decompressed Data Written (in bytes):\t{self.written}")
+        if self.fec is not None:
+            self.events.info(f"Number of Data segments recovered from parity (FEC):\t{self.fecRecovered}")
+        if self.file is not None:
+            self.file.close()
+        self.events.close()
+        self.state = CLOSED
+        if self.closeHandle is not None:
+            self.closeHandle.cancel()
+        self.receiver.sessionClosed(self)
+
+    def abort(self) -> None:
+        '''RESET: stop without statistics'''
+        self.clearDelayedAck()
+        if self.file is not None:
+            self.file.close()
+        self.events.close()
+        self.state = CLOSED
+        self.receiver.sessionClosed(self)
+
+    def discard(self) -> None:
+        '''its SYN was dropped and the sender moved on: go away without counting as a transfer'''
+        self.events.close()
+        self.state = CLOSED
+        self.receiver.sessionClosed(self, counted=False)
+
+    def expire(self) -> None:
+        '''the sender has been silent for idleTimeout: presume it dead'''
+        if self.state == LISTEN:
+            self.discard()
+        else:
+            self.abort()
+
+    def sendPacket(self, seqNo: int, type: int, content: bytes = b""):
+        message = encodeSegment(self.version, type, seqNo, content, self.window())
+        elapsed = time.time() - self.startTime
+        if type == ACK:
+            self.acksSent += 1
+        if random.random() > self.receiver.rlp:
+            self.events.packet(SND, type, seqNo, 0, elapsed)
+            self.receiver.transmit(message, self.address)
+        else :
+            if type == ACK:
+                self.ackSegDropped += 1
+            self.events.packet(SND, type, seqNo, 0, elapsed)
+
+    def metricsSnapshot(self) -> dict:
+        elapsed = time.time() - self.startTime
+        return {
+            "address": f"{self.address[0]}:{self.address[1]}",
+            "isn": self.isn,
+            "state": ("LISTEN", "ESTABLISHED", "TIME_WAIT", "CLOSED")[self.state],
+            "elapsed": elapsed,
+            "goodput": self.dataReceived / elapsed if elapsed > 0 else 0,
+            "dataReceived": self.dataReceived,
+            "segmentsReceived": self.segmentsReceived,
+            "dupSegReceived": self.dupSegReceived,
+            "dataSegDropped": self.dataSegDropped,
+            "ackSegDropped": self.ackSegDropped,
+            "acksSent": self.acksSent,
+            "fecRecovered": self.fecRecovered,
+            "bytesWritten": self.dataReceived if self.decompressor is None else self.written,
+            "reorderDepth": len(self.packetBuffer),
+            "reorderRanges": len(self.packetBuffer.starts),
+        }
+
+    def processBuffer(self, file):
+        '''advance past every buffered segment that the last in-order segment made contiguous'''
+        length = self.packetBuffer.pop(self.lastACKNo)
+        while length is not None:
+            if self.decompressor is not None:
+                self.deliver(self.held.pop(self.lastACKNo))
+            self.segmentsReceived += 1
+            self.dataReceived += length
+            self.lastACKNo = (self.lastACKNo + length) % self.seqSpace
+            length = self.packetBuffer.pop(self.lastACKNo)
+
+
+class Receiver:
+    def __init__(self, receiver_port: int, sender_port: int, filename: str, flp: float, rlp: float, engine: str = "thread", fsync: str = "none", sessions: str = "1", workers: str = "1",
+                 sack: str = "on", rwnd: str = str(64 * 1024 * 1024), mss: str = str(MAXDATAGRAM - HEADERSIZE[HEADER_V1]),
+                 batch: str = "on", log: str = "text", metrics: str = "", metrics_interval: str = "1", metrics_hooks: str = "off", seed: str = "",
+                 ack_every: str = "2", ack_delay: str = "0.005", fec: str = "on",
+                 compress: str = "on", idle_timeout: str = "120") -> None:
+        '''
+        The server will be able to receive the file from the sender via UDP
+        :param receiver_port: the UDP port number to be used by the receiver to receive PTP segments from the sender.
+        :param sender_port: the UDP port number to be used by the sender to send PTP segments to the receiver.
+        :param filename: the name of the text file into which the text sent by the sender should be stored
+        :param flp: forward loss probability, which is the probability that any segment in the forward direction (Data, FIN, SYN) is lost.
+        :param rlp: reverse loss probability, which is the probability of a segment in the reverse direction (i.e., ACKs) being lost.
+        :param engine: "thread" for the blocking recvfrom loop, "asyncio" for the event-driven engine.
+        :param fsync: when to force the output file to disk: "none", "close" or every N bytes written.
+        :param sessions: number of transfers to accept before exiting, 0 for no limit.
+        :param workers: number of receiver processes sharing the port through SO_REUSEPORT.
+        :param sack: "on" to report out-of-order data as SACK blocks when the sender offers it.
+        :param rwnd: receive window in bytes advertised in version 2 headers.
+        :param mss: largest DATA payload to accept when the SYN offers one.
+        :param batch: "on" to read with GRO and send ACKs in GSO batches where the kernel supports it.
+        :param log: "text" for Receiver_log.txt lines, "trace" for binary records in Receiver_trace.bin, "stats" for statistics only.
+        :param metrics: JSON snapshot file, or unix:<path> for a stats socket; empty for no live metrics.
+        :param metrics_interval: seconds between snapshot files.
+        :param metrics_hooks: "on" to time the hot-path methods.
+        :param seed: integer seed for the flp/rlp drops; empty for a different pattern every run.
+        :param ack_every: in-order full segments acknowledged by one ACK, 1 for an ACK per segment.
+        :param ack_delay: longest time in seconds an in-order segment waits for its ACK.
+        :param fec: "on" to accept forward error correction when the SYN offers it.
+        :param compress: "on" to accept a compressed stream when the SYN offers an installed codec.
+        :param idle_timeout: seconds of silence after which a session is dropped when there are several, 0 for never.
+
+        '''
+        self.address = "127.0.0.1"  # change it to 0.0.0.0 or public ipv4 address if want to test it between different computers
+        self.receiver_port = int(receiver_port)
+        self.sender_port = int(sender_port)
+        self.server_address = (self.address, self.receiver_port)
+        self.sender_address = (self.address, self.sender_port)  # ACKs go back to each segment's source address
+
+        random.seed(int(seed) if seed else None)
+        self.receiver_port = receiver_port
+        self.sender_port = sender_port
+        self.fileName = filename
+        self.flp = float(flp)
+        self.rlp = float(rlp)
+        if engine not in ("thread", "asyncio"):
+            raise ValueError(f"unknown engine {engine!r}, expected thread or asyncio")
+        self.engine = engine
+        parseFsync(fsync)  # fail at start-up, not in handleOpen after the SYN-ACK is out
+        self.fsync = fsync
+        self.maxSessions = int(sessions)
+        self.workers = int(workers)
+        if sack not in ("on", "off"):
+            raise ValueError(f"bad sack {sack!r}, expected on or off")
+        self.sack = sack == "on"
+        self.rwnd = int(rwnd)
+        if not 0 < self.rwnd <= MAXWINDOWFIELD << MAXWSCALE:
+            raise ValueError(f"bad rwnd {rwnd!r}, expected 1 to {MAXWINDOWFIELD << MAXWSCALE} bytes")
+        self.windowShift = min(max(self.rwnd.bit_length() - 16, 0), MAXWSCALE)
+        self.mss = int(mss)
+        if self.mss <= 0:
+            raise ValueError(f"bad mss {mss!r}, expected a positive byte count")
+        if batch not in ("on", "off"):
+            raise ValueError(f"bad batch {batch!r}, expected on or off")
+        if log not in ("text", "trace", "stats"):
+            raise ValueError(f"bad log level {log!r}, expected text, trace or stats")
+        self.logLevel = log
+        if metrics and self.workers > 1:
+            metrics = f"{metrics}.{os.getpid()}"  # one target per worker process
+        self.metrics = openMetrics(metrics, metrics_interval)
+        if metrics_hooks not in ("on", "off"):
+            raise ValueError(f"bad metrics_hooks {metrics_hooks!r}, expected on or off")
+        self.metricsHooks = self.metrics is not None and metrics_hooks == "on"
+        self.ackEvery = int(ack_every)
+        if self.ackEvery < 1:
+            raise ValueError(f"bad ack_every {ack_every!r}, expected a segment count >= 1")
+        self.ackDelay = float(ack_delay)
+        if self.ackDelay < 0:
+            raise ValueError(f"bad ack_delay {ack_delay!r}, expected seconds >= 0")
+        if fec not in ("on", "off"):
+            raise ValueError(f"bad fec {fec!r}, expected on or off")
+        self.fec = fec == "on"
+        if compress not in ("on", "off"):
+            raise ValueError(f"bad compress {compress!r}, expected on or off")
+        self.compress = compress == "on"
+        self.idleTimeout = float(idle_timeout)
+        if self.idleTimeout < 0:
+            raise ValueError(f"bad idle_timeout {idle_timeout!r}, expected seconds >= 0")
+        self.pendingAcks = []  # sessions holding a delayed ACK
+        # one transfer keeps the original file and log names, several get one of each per session
+        self.multiSession = self.maxSessions != 1 or self.workers > 1
+        if not self.multiSession:
+            self.idleTimeout = 0  # a single transfer keeps waiting for its sender, as it always has
+
+        self.sessions = {}  # (address, isn) -> Session
+        self.current = {}  # address -> key of the newest session from that address
+        self.closedSessions = 0
+        self.running = True
+        self.done = None  # asyncio engine: resolved once the last session is closed
+
+        # init the UDP socket
+        # define socket for the server side and bind address
+        self.receiver_socket = socket.socket(family=socket.AF_INET, type=socket.SOCK_DGRAM)
+        if self.workers > 1:
+            self.receiver_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        self.receiver_socket.bind(self.server_address)
+        if batch == "on":
+            enlargeBuffers(self.receiver_socket)
+        self.batch = BatchSender(self.receiver_socket, gso=batch == "on")
+        self.segmentReceiver = BatchReceiver(self.receiver_socket, gro=batch == "on")
+
+        if self.metrics is not None:
+            self.metrics.addSource("receiver", self.metricsSnapshot)
+            if self.metricsHooks:
+                self.metrics.instrument(self, ["dispatch"])
+
+    def run(self) -> None:
+        '''
+        This function contain the main logic of the receiver
+        '''
+        if self.metrics is not None:
+            self.metrics.start()
+        if self.engine == "asyncio":
+            asyncio.run(self.runAsync())
+            if self.metrics is not None:
+                self.metrics.stop()
+            exit(0)
+        while True:
+            timeout = self.expireSessions()
+            if not self.running:
+                break
+            self.receiver_socket.settimeout(timeout)
+            try:
+                messages, sender_address = self.segmentReceiver.recv()
+            except socket.timeout:
+                continue
+            self.receiver_socket.settimeout(0)
+            self.readBatch(messages, sender_address)
+        if self.metrics is not None:
+            self.metrics.stop()
+        exit(0)
+
+    def expireSessions(self):
+        '''
+        finish sessions whose TIME_WAIT is over and drop those idle for longer
+        than idleTimeout; seconds until the next one is due, or None
+        '''
+        now = time.time()
+        timeout = None
+        for session in list(self.sessions.values()):
+            if session.state == TIME_WAIT:
+                due = session.closeTime
+                if now >= due:
+                    session.finish()
+                    continue
+            elif self.idleTimeout:
+                due = session.lastHeard + self.idleTimeout
+                if now >= due:
+                    session.expire()
+                    continue
+            else:
+                continue
+            if timeout is None or due - now < timeout:
+                timeout = due - now
+        return timeout
+
+    def checkIdle(self) -> None:
+        '''asyncio engine: drop idle sessions, then look again when the next one can be due'''
+        timeout = self.expireSessions()  # finishing a TIME_WAIT before its own call_later is harmless
+        if self.running:
+            asyncio.get_running_loop().call_later(self.idleTimeout if timeout is None else timeout, self.checkIdle)
+
+    async def runAsync(self) -> None:
+        '''event-driven counterpart of run()'''
+        loop = asyncio.get_running_loop()
+        self.done = loop.create_future()
+        self.receiver_socket.setblocking(False)
+        loop.add_reader(self.receiver_socket.fileno(), self.onReadable)
+        if self.idleTimeout:
+            loop.call_later(self.idleTimeout, self.checkIdle)
+        try:
+            await self.done
+        finally:
+            loop.remove_reader(self.receiver_socket.fileno())
+            self.receiver_socket.close()
+
+    def onReadable(self) -> None:
+        '''asyncio engine: handle the datagrams queued on the socket like one read of run()'''
+        try:
+            messages, sender_address = self.segmentReceiver.recv()
+        except (BlockingIOError, ConnectionRefusedError):
+            return
+        self.readBatch(messages, sender_address)
+        if not self.running and not self.done.done():
+            self.done.set_result(None)
+
+    def readBatch(self, messages: list, sender_address: tuple) -> None:
+        '''
+        dispatch one read from the now non-blocking socket and keep reading
+        whatever is already queued while a delayed ACK can still cover it, but
+        stop as soon as an ACK that must go out at once is queued; then send
+        the ACKs of the whole batch
+        '''
+        deadline = time.time() + self.ackDelay
+        while True:
+            for incoming_message in messages:
+                self.dispatch(incoming_message, sender_address)
+            if not self.pendingAcks or self.batch.pending or time.time() >= deadline:
+                break
+            try:
+                messages, sender_address = self.segmentReceiver.recv()
+            except BlockingIOError:
+                break
+        self.flushAcks()
+        self.batch.flush()
+
+    def flushAcks(self) -> None:
+        '''send the delayed ACK of every session that holds one'''
+        for session in list(self.pendingAcks):
+            session.flushAck()
+        self.pendingAcks = []
+
+    def dispatch(self, incoming_message: bytes, sender_address: tuple):
+        '''route a datagram to its session, opening one for a new SYN'''
+        header = decodeHeader(incoming_message)
+        if header is None:
+            return None  # runt or unknown version
+        version, type, seqNo, _, data = header
+        key = self.current.get(sender_address)
+        session = self.sessions.get(key)
+        if type == SYN and session is not None and session.isn != seqNo:
+            # a new transfer from an address whose last one is in TIME_WAIT, lost
+            # its SYN (LISTEN) or was abandoned by a restarted sender (ESTABLISHED)
+            if session.state == TIME_WAIT:
+                session.finish()
+            elif session.state == LISTEN:
+                session.discard()
+            else:
+                session.abort()
+            if not self.running:
+                return None
+            session = None
+        if type == SYN and session is None:
+            session = self.openSession(sender_address, seqNo, version)
+        if session is None:
+            if not self.multiSession:
+                self.running = False  # the first segment did not open a connection
+            return None
+        session.handleSegment(type, seqNo, data)
+        return session
+
+    def openSession(self, sender_address: tuple, isn: int, version: int = HEADER_V1) -> Session:
+        key = (sender_address, isn)
+        if self.multiSession:
+            tag = f"{sender_address[0]}_{sender_address[1]}-{isn}"
+            stem, dot, ext = self.fileName.rpartition(".")
+            fileName = f"{stem}-{tag}.{ext}" if dot else f"{self.fileName}-{tag}"
+            # not registered with logging.getLogger, so it is freed with the session
+            log = logging.Logger(f"session.{tag}", logging.INFO)
+            handler = logging.FileHandler(f"Receiver_log-{tag}.txt", mode="w")
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            log.addHandler(handler)
+            traceName = f"Receiver_trace-{tag}.bin"
+        else:
+            fileName = self.fileName
+            log = logging.getLogger()
+            traceName = "Receiver_trace.bin"
+        session = Session(self, sender_address, isn, fileName, log, openEventLog(self.logLevel, log, traceName), version)
+        if self.metricsHooks:
+            self.metrics.instrument(session, ["handleSegment", "processBuffer"])
+        self.sessions[key] = session
+        self.current[sender_address] = key
+        return session
+
+    def metricsSnapshot(self) -> dict:
+        '''live per-session counters for metrics.py'''
+        return {
+            "closedSessions": self.closedSessions,
+            "sessions": [session.metricsSnapshot() for session in list(self.sessions.values())],
+        }
+
+    def sessionClosed(self, session: Session, counted: bool = True) -> None:
+        key = (session.address, session.isn)
+        self.sessions.pop(key, None)
+        if self.current.get(session.address) == key:
+            del self.current[session.address]
+        if session.log is not logging.getLogger():
+            for handler in list(session.log.handlers):
+                handler.close()
+                session.log.removeHandler(handler)
+        if not counted:
+            return
+        self.closedSessions += 1
+        if self.maxSessions and self.closedSessions >= self.maxSessions:
+            self.running = False
+            if self.done is not None and not self.done.done():
+                self.done.set_result(None)
+
+    def transmit(self, message: tuple, address: tuple):
+        '''queue for the flush at the end of readBatch'''
+        self.batch.add(message, address)
+
+
+def serveWorker(args: list, options: dict):
+    '''body of one receiver process in --workers mode'''
+    receiver = Receiver(*args, **options)
+    receiver.run()
+
+
+def runWorkers(args: list, options: dict):
+    '''
+    Start --workers receiver processes bound to the same port with SO_REUSEPORT.
+    The kernel hashes each sender's address to one socket, so every session
+    stays inside one process and ingest spreads across cores.
+    '''
+    if options.get("sessions", "0") != "0":
+        raise ValueError("--workers needs --sessions=0, each process cannot know when the others are done")
+    options = dict(options, sessions="0")
+    processes = []
+    for index in range(int(options["workers"])):
+        workerOptions = dict(options)
+        if options.get("seed"):
+            workerOptions["seed"] = str(int(options["seed"]) + index)  # distinct drops per process
+        processes.append(multiprocessing.Process(target=serveWorker, args=(args, workerOptions)))
+    for process in processes:
+        process.start()
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        for process in processes:
+            process.terminate()
+
+
+if __name__ == '__main__':
+    # logging is useful for the log part: https://docs.python.org/3/library/logging.html
+    logging.basicConfig(
+        filename="Receiver_log.txt",
+        filemode="w",
+        format="%(message)s",
+        level=logging.NOTSET)
+
+    if len(sys.argv) < 6:
+        print(
+            "\n===== Error usage, python3 receiver.py receiver_port sender_port FileReceived.txt flp rlp [--engine=thread|asyncio] [--fsync=none|close|<bytes>] [--sessions=N] [--workers=N] [--sack=on|off] [--rwnd=bytes] [--mss=bytes] [--batch=on|off] [--log=text|trace|stats] [--metrics=file.json|unix:path] [--metrics-interval=s] [--metrics-hooks=on|off] [--seed=N] [--ack-every=N] [--ack-delay=s] [--fec=on|off] [--compress=on|off] [--idle-timeout=s] ======\n")
+        exit(0)
+
+    options = parseOptions(sys.argv[6:])
+    if int(options.get("workers", "1")) > 1:
+        runWorkers(sys.argv[1:6], options)
+        exit(0)
+    receiver = Receiver(*sys.argv[1:6], **options)
+    receiver.run()
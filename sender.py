@@ -1,269 +1,1103 @@
-"""
-    Sample code for Sender (multi-threading)
-    Python 3
-    Usage: python3 sender.py receiver_port sender_port FileToSend.txt max_recv_win rto
-    coding: utf-8
-
-    Notes:
-        Try to run the server first with the command:
-            python3 receiver_template.py 9000 10000 FileReceived.txt 1 1
-        Then run the sender:
-            python3 sender_template.py 11000 9000 FileToReceived.txt 1000 1
-
-    Author: Rui Li (Tutor for COMP3331/9331)
-"""
-# here are the libs you may find it useful:
-import datetime, time  # to calculate the time delta of packet transmission
-import logging, sys  # to write the log
-import socket  # Core lib, to send packet via UDP socket
-import random  # for seqNo
-import threading  # (Optional)threading will make the timer easily implemented
-
-BUFFERSIZE = 1024
-DATA = 0
-ACK = 1
-SYN = 2
-FIN = 3
-RESET = 4
-MAXSEQNO = 65535
-MSS = 1000
-
-class ControlBlock:
-    seqNo = 0
-    sentPackets = []
-
-class Sender:
-    def __init__(self, sender_port: int, receiver_port: int, filename: str, max_win: int, rot: int) -> None:
-        '''
-        The Sender will be able to connect the Receiver via UDP
-        :param sender_port: the UDP port number to be used by the sender to send PTP segments to the receiver
-        :param receiver_port: the UDP port number on which receiver is expecting to receive PTP segments from the sender
-        :param filename: the name of the text file that must be transferred from sender to receiver using your reliable transport protocol.
-        :param max_win: the maximum window size in bytes for the sender window.
-        :param rot: the value of the retransmission timer in milliseconds. This should be an unsigned integer.
-        '''
-        self.sender_port = int(sender_port)
-        self.receiver_port = int(receiver_port)
-        self.sender_address = ("127.0.0.1", self.sender_port)
-        self.receiver_address = ("127.0.0.1", self.receiver_port)
-
-        self.cb = ControlBlock()
-        self.control_lock = threading.Lock()
-        self.badACKS = []
-        self.startTime = time.time()
-        self.dataTransferred = 0
-        self.dataSegments = 0
-        self.retransmittedSegments = 0
-        self.duplicateACKS = 0
-        self.rot = rot
-        self.fileName = filename
-        self.max_win = int(max_win)
-        self.acksRecieved = []
-
-        random.seed()
-        self.cb.seqNo = random.randint(0, MAXSEQNO)
-        while (self.cb.seqNo > (MAXSEQNO - 100)):
-            self.cb.seqNo = random.randint(0, MAXSEQNO)
-
-
-        # init the UDP socket
-        self.sender_socket = socket.socket(family=socket.AF_INET, type=socket.SOCK_DGRAM)
-        self.sender_socket.bind(self.sender_address)
-
-        #  (Optional) start the listening sub-thread first
-        self._is_active = True  # for the multi-threading
-        self.listenThread = threading.Thread(target=self.listen)
-        self.listenThread.daemon = True
-        self.listenThread.start()
-
-        self.timeOutThread = threading.Thread(target=self.timeOut)
-        self.timeOutThread.daemon = True
-        self.timeOutThread.start()
-
-    def ptp_open(self):
-        #CLOSED -> SYNSENT: Open/send SYN
-        time.sleep(0.5)
-        self.startTime = time.time()
-        self.sendPacket(bytearray(0), SYN)
-        self.cb.seqNo += 1
-
-    def ptp_send(self):
-        '''(Multithread is used)send packets'''
-        #copy data to send
-        packetsToSend = []
-        file = open(self.fileName, "rb")
-        data = bytearray(file.read())
-        self.dataTransferred = len(data)
-        file.close()
-        i = 0
-        while i < len(data):
-            packetsToSend.append(data[i:(i + MSS)])
-            i+=MSS
-        self.dataSegments = len(packetsToSend)
-        #idle waiting for first response
-        while True:
-            self.control_lock.acquire()  
-            if (len(self.cb.sentPackets) == 0):
-                self.control_lock.release() 
-                break
-            if (len(self.cb.sentPackets) > 0 and self.cb.sentPackets[0][3] >= 3):
-                self.sendPacket(bytearray(0), RESET)
-                self.control_lock.release() 
-                exit(0)
-            self.control_lock.release() 
-        #send rest of packets
-        while self._is_active:
-            self.control_lock.acquire()
-            if len(packetsToSend) == 0 and len(self.cb.sentPackets) == 0:
-                self.control_lock.release() 
-                break
-            if len(self.cb.sentPackets) < self.max_win/MSS and len(packetsToSend) > 0:
-                self.sendPacket(packetsToSend.pop(0), DATA)
-            self.control_lock.release() 
-
-
-    def ptp_close(self):
-        self.sendPacket(bytearray(0), FIN)
-        while True:
-            self.control_lock.acquire()
-            if len(self.cb.sentPackets) == 0:
-                self.control_lock.release()
-                break
-            self.control_lock.release()
-        self._is_active = False  # close the sub-thread
-        logging.info(f"Amount of (original) Data Transferred (in bytes) (excluding retransmissions):\t{self.dataTransferred}")
-        logging.info(f"Number of Data Segments Sent (excluding retransmissions):\t{self.dataSegments}")
-        logging.info(f"Number of Retransmitted Data Segments:\t{self.retransmittedSegments}")
-        logging.info(f"Number of Duplicate Acknowledgements received:\t{self.duplicateACKS}")
-        exit(0)
-
-
-    def timeOut(self):
-        '''(Multithread is used) handler for timeout events'''
-        while self._is_active:
-            self.control_lock.acquire() 
-            if len(self.cb.sentPackets) > 0 and time.time() - self.cb.sentPackets[0][0] > float(self.rot):
-                self.control_lock.release()
-                self.retransmittedSegments += 1
-                self.control_lock.acquire()
-                self.sender_socket.sendto(self.cb.sentPackets[0][2], self.receiver_address)
-                self.cb.sentPackets[0][0] = time.time()
-                self.cb.sentPackets[0][3] += 1
-                sendTime = round((time.time() - self.startTime) * 100, 2)
-                if self.cb.sentPackets[0][5] == "SYN":
-                    logging.info(f"snd\t{sendTime:8}\t{self.cb.sentPackets[0][5]:4}\t{self.cb.sentPackets[0][1] - 1:8}\t{self.cb.sentPackets[0][4]:4}")
-                else:
-                    logging.info(f"snd\t{sendTime:8}\t{self.cb.sentPackets[0][5]:4}\t{self.cb.sentPackets[0][1]:8}\t{self.cb.sentPackets[0][4]:4}")
-                self.control_lock.release()
-            else:
-                self.control_lock.release()
-            time.sleep(0.005)
-
-    def listen(self):
-        '''(Multithread is used)listen the response from receiver'''
-        while self._is_active:  
-            incoming_message, _ = self.sender_socket.recvfrom(BUFFERSIZE)
-            rcvTime = round((time.time() - self.startTime) * 100, 2)
-            logging.info(f"rcv\t{rcvTime:8}\tACK \t{str(self.seqNoConv(incoming_message)):8}\t{0:4}")
-            self.control_lock.acquire()
-            #clear older packets
-            for packet in self.cb.sentPackets:
-                if self.seqNoConv(incoming_message) < MSS:
-                    if packet[1] > self.seqNoConv(incoming_message) + MSS * self.max_win/1000 :
-                        self.cb.sentPackets.remove(packet)
-                elif self.seqNoConv(incoming_message) + MSS * self.max_win/1000 > MAXSEQNO:
-                    if packet[1] < self.seqNoConv(incoming_message) and packet[1] > (self.seqNoConv(incoming_message) + MSS * self.max_win/1000) % MAXSEQNO:
-                        self.cb.sentPackets.remove(packet)
-                else:
-                    if packet[1] < self.seqNoConv(incoming_message):
-                        self.cb.sentPackets.remove(packet)
-            self.control_lock.release()
-            #process new packet
-            if (int(self.typeConv(incoming_message)) == ACK):
-                if (self.seqNoConv(incoming_message) in self.acksRecieved):
-                    self.duplicateACKS += 1
-                else:
-                    self.acksRecieved.append(self.seqNoConv(incoming_message))
-                self.control_lock.acquire()
-                if len(self.cb.sentPackets) > 0 and self.cb.sentPackets[0][1] == self.seqNoConv(incoming_message):
-                    #if its next packet expected, remove it from packet array and see if any other packets have also been acked out of order
-                    self.cb.sentPackets.pop(0)
-                    self.control_lock.release()  
-                    for i in range(0, len(self.badACKS)):
-                        for ack in self.badACKS:
-                            self.control_lock.acquire()
-                            if len(self.cb.sentPackets) > 0 and self.cb.sentPackets[0][1] == self.seqNoConv(ack):
-                                self.cb.sentPackets.pop(0)
-                            self.control_lock.release() 
-                    self.badACKS.clear()
-                else:
-                    #add it to the out of order packets and check if we need to resent old data segment
-                    self.control_lock.release() 
-                    if incoming_message in self.badACKS:
-                        self.duplicateACKS += 1
-                    self.badACKS.append(incoming_message)
-                    if len(self.badACKS) >= 3 and self.badACKS[0] == self.badACKS[1] == self.badACKS[2]:
-                        self.retransmittedSegments += 1
-                        self.control_lock.acquire()
-                        self.sender_socket.sendto(self.cb.sentPackets[0][2], self.receiver_address)
-                        self.cb.sentPackets[0][0] = time.time()
-                        self.cb.sentPackets[0][3] += 1
-                        sendTime = round((time.time() - self.startTime) * 100, 2)
-                        if self.cb.sentPackets[0][5] == "SYN":
-                            logging.info(f"snd\t{sendTime:8}\t{self.cb.sentPackets[0][5]:4}\t{self.cb.sentPackets[0][1] - 1:8}\t{self.cb.sentPackets[0][4]:4}")
-                        else:
-                            logging.info(f"snd\t{sendTime:8}\t{self.cb.sentPackets[0][5]:4}\t{self.cb.sentPackets[0][1]:8}\t{self.cb.sentPackets[0][4]:4}")
-                        self.control_lock.release()
-                        self.badACKS.clear()
-            
-
-    def run(self):
-        '''
-        This function contain the main logic of the receiver
-        '''
-        self.ptp_open()
-        self.ptp_send()
-        self.ptp_close()
-
-    def sendPacket(self, content: bytearray, type: int):
-        formType = bytearray(type.to_bytes(2, "big"))
-        formSeqNo = bytearray(self.cb.seqNo.to_bytes(2, "big")) 
-        message = bytes(formType + formSeqNo + content)
-        sendTime = round((time.time() - self.startTime) * 100, 2)
-        if type == DATA: typestr = "DATA"
-        if type == ACK: typestr = "ACK"
-        if type == SYN: typestr = "SYN"
-        if type == FIN: typestr = "FIN"
-        if type == RESET: typestr = "RESET" 
-        logging.info(f"snd\t{sendTime:8}\t{typestr:4}\t{self.cb.seqNo:8}\t{len(content):4}")
-        self.sender_socket.sendto(message, self.receiver_address)
-        self.cb.seqNo = (self.cb.seqNo + len(content)) % MAXSEQNO 
-        if type == SYN or type == FIN: 
-            self.cb.sentPackets.append([time.time(), self.cb.seqNo + 1, message, 0, len(content), typestr])      
-        else: 
-            self.cb.sentPackets.append([time.time(), self.cb.seqNo, message, 0, len(content), typestr]) 
-    
-    def typeConv(self, content: bytes) -> int:
-        return int.from_bytes(bytes(bytearray(content)[:2]), "big")
-
-    def seqNoConv(self, content: bytes) -> int:
-        return int.from_bytes(bytes(bytearray(content)[2:4]), "big")
-
-    def dataConv(self, content: bytes) -> bytes:
-        return bytes(bytearray(content)[4:])
-
-if __name__ == '__main__':
-    # logging is useful for the log part: https://docs.python.org/3/library/logging.html
-    logging.basicConfig(
-        filename="Sender_log.txt",
-        filemode="w",
-        format="%(message)s",
-        level=logging.NOTSET)
-
-    if len(sys.argv) != 6:
-        print(
-            "\n===== Error usage, python3 sender.py sender_port receiver_port FileReceived.txt max_win rot ======\n")
-        exit(0)
-
-    sender = Sender(*sys.argv[1:])
-    sender.run()
\ No newline at end of file
+"""
+    Sample code for Sender (multi-threading)
+    Python 3
+    Usage: python3 sender.py receiver_port sender_port FileToSend.txt max_recv_win rto [--engine=thread|asyncio]
+           [--rto-mode=adaptive|fixed] [--rto-min=seconds] [--rto-max=seconds]
+           [--cc=newreno|vegas|fixed] [--pacing=on|off] [--sack=on|off] [--header=auto|1|2]
+           [--mss=bytes] [--batch=on|off] [--log=text|trace|stats]
+           [--metrics=file.json|unix:path] [--metrics-interval=seconds] [--metrics-hooks=on|off]
+           [--fec=off|K:M] [--compress=off|zlib|lzma|zstd[:level]]
+    coding: utf-8
+
+    Notes:
+        Try to run the server first with the command:
+            python3 receiver_template.py 9000 10000 FileReceived.txt 1 1
+        Then run the sender:
+            python3 sender_template.py 11000 9000 FileToReceived.txt 1000 1
+
+        --engine=asyncio replaces the listen/timeOut threads with a single event
+        loop: a loop.add_reader callback drains every ACK queued on the socket
+        before the window is refilled, and timer expiry is scheduled with
+        loop.call_later, so nothing polls while the window is full.
+
+        FileToSend.txt is streamed: regular files are memory-mapped and cut into
+        segments on demand, and "-" (or any pipe) is read in chunks, so sending
+        starts at once and memory use does not grow with the file size.
+
+        rto is the initial retransmission timeout in seconds. With the default
+        --rto-mode=adaptive it is then derived from measured RTTs (RFC 6298:
+        SRTT/RTTVAR, Karn's rule, exponential backoff) and clamped to
+        [--rto-min, --rto-max] (default 0.2 and 60 seconds; a lower floor lets
+        queueing delay pass for loss); every change is logged as an "rto" line.
+        A timeout resends the oldest segment at once; other segments whose
+        timers ran out follow as the collapsed window and the pacer allow.
+        --rto-mode=fixed keeps rto for the whole transfer.
+
+        --cc picks the congestion controller from congestion.py (default newreno);
+        max_win stays the hard cap on bytes in flight and --cc=fixed sends the
+        whole max_win as before. --pacing (default on) spreads each window over
+        one smoothed RTT with a token bucket instead of sending it back to back.
+
+        --sack (default on) offers selective acknowledgements in the SYN. When the
+        receiver agrees, segments it reports in SACK blocks are no longer timed or
+        counted in flight, and every hole with three segments SACKed above it is
+        resent at once rather than one hole per round trip. Without SACK the
+        timers of the segments behind a timed-out head restart from its
+        retransmission, and the statistics cannot tell real timer expirations
+        from spurious ones (shown as "-").
+
+        --header picks the wire format. Version 1 is the original 16-bit header,
+        whose sequence space only allows max_win + mss up to half of it; version 2 has
+        32-bit sequence numbers and honours the receive window the receiver
+        advertises, scaled by the shift agreed in the SYN. auto (the default)
+        uses version 2 only when max_win needs it.
+
+        --mss other than the default 1000 is offered in the SYN and the receiver
+        may lower it; a receiver that does not answer the option gets the original
+        1000 bytes. With --sack=off, --header=1 and the default mss the SYN
+        carries no options, as the original receiver expects.
+        With --batch=on (the default) each window is handed to the kernel with
+        batchio.BatchSender (UDP GSO on Linux) and ACKs are read with GRO, so one
+        syscall carries many segments.
+
+        --log=trace records packet events in Sender_trace.bin through a ring buffer
+        drained by a background thread instead of formatting every line while
+        control_lock is held; "python3 tracelog.py Sender_trace.bin" renders it as
+        Sender_log.txt. --log=stats writes only the statistics.
+
+        --metrics publishes live counters, goodput, bytes in flight, cwnd, RTO and
+        histograms of RTT and control_lock wait time while the transfer runs, as a
+        JSON file or on a UNIX socket (see metrics.py). --metrics-hooks=on also
+        times sendPacket, processAck (the body of listen) and expireTimers.
+
+        --fec=K:M offers forward error correction in the SYN: after every K DATA
+        segments M interleaved XOR parity segments follow (see fec.py), so the
+        receiver can rebuild one lost segment in each group without waiting for
+        a retransmission. They cost M/K extra bandwidth and are not counted in
+        the window; keep K segments well below max_win, the block has to be sent
+        before its parity can help. Fast retransmit then waits for K + M more
+        duplicate ACKs (or SACKed segments) so that the parity gets its chance.
+
+        --compress offers a codec in the SYN; if the receiver accepts it the file
+        is sent as one compressed stream (see compression.py), unless a sample
+        of it shows that it does not compress. The transfer statistics then
+        count compressed bytes and a Compression line gives the file size.
+
+    Author: Rui Li (Tutor for COMP3331/9331)
+"""
+# here are the libs you may find it useful:
+import datetime, time  # to calculate the time delta of packet transmission
+import logging, sys  # to write the log
+import socket  # Core lib, to send packet via UDP socket
+import random  # for seqNo
+import threading  # (Optional)threading will make the timer easily implemented
+import asyncio  # event-driven engine, selected with --engine=asyncio
+import heapq  # deadline heap for the per-segment retransmission timers
+import itertools  # walk the send queue behind its head
+from collections import deque  # in-flight send queue
+import mmap  # zero-copy view of the file to send
+from congestion import CONTROLLERS, Pacer  # congestion window and send pacing
+from batchio import BatchSender, BatchReceiver, MAXDATAGRAM, enlargeBuffers  # GSO/GRO batched socket I/O
+from metrics import openMetrics, TimedLock  # live JSON snapshots, histograms and hot-path timing
+from tracelog import openEventLog, SND, RCV, LEFTALIGN  # text, binary trace or statistics-only event log
+from fec import ParityEncoder, parseFec  # XOR parity segments
+from compression import CompressedSource, parseCompression, probe, MINSAVING, READSIZE  # zlib/lzma/zstd stream
+from packet import (DATA, ACK, SYN, FIN, RESET, PARITY, MAXSEQNO, MSS, HEADER_V1, HEADER_V2, SEQSPACE, HEADERSIZE,
+                    OPT_SACK, OPT_WSCALE, OPT_MSS, OPT_FEC, OPT_COMPRESS, encodeSegment, decodeHeader, encodeOptions, decodeOptions,
+                    decodeSack, seqBefore)  # segment format shared with the receiver
+from options import parseOptions  # --name=value arguments
+
+DUPTHRESH = 3  # segments SACKed above a hole before it is declared lost
+READBATCH = 64  # asyncio engine: reads per readable callback before timers get a turn
+
+class Segment:
+    '''one unacknowledged PTP segment'''
+    __slots__ = ("seqNo", "ackNo", "message", "length", "type", "sendTime", "retries", "deadline", "timedOut", "sacked", "lost")
+
+    def __init__(self, seqNo: int, ackNo: int, message: tuple, length: int, type: int) -> None:
+        self.seqNo = seqNo  # first sequence number carried
+        self.ackNo = ackNo  # cumulative ACK number that retires this segment
+        self.message = message
+        self.length = length
+        self.type = type
+        self.sendTime = time.time()  # time of the latest (re)transmission
+        self.retries = 0
+        self.deadline = None  # live retransmission deadline, None once cancelled
+        self.timedOut = False
+        self.sacked = False  # reported received by a SACK block
+        self.lost = False  # timed out and waiting in Sender.retransmitQueue
+
+class SendQueue:
+    '''
+    In-flight segments in sequence order, indexed by the ACK number that retires
+    each one. A cumulative ACK is looked up in O(1) and retires everything up to
+    it from the left of the deque; an ACK that matches no segment boundary cannot
+    advance the window and is a duplicate. The bySeq index lets SACK processing
+    walk the queue from any block edge.
+    '''
+    def __init__(self) -> None:
+        self.segments = deque()
+        self.byAck = {}
+        self.bySeq = {}
+        self.bytes = 0  # payload bytes in flight
+        self.sackedBytes = 0  # of which the receiver already holds this much
+        self.lostBytes = 0  # and this much timed out and waits to be resent
+
+    def __len__(self) -> int:
+        return len(self.segments)
+
+    def head(self) -> Segment:
+        return self.segments[0]
+
+    def tail(self) -> Segment:
+        return self.segments[-1]
+
+    def append(self, segment: Segment):
+        self.segments.append(segment)
+        self.byAck[segment.ackNo] = segment
+        self.bySeq[segment.seqNo] = segment
+        self.bytes += segment.length
+
+    def markSacked(self, segment: Segment):
+        self.unmarkLost(segment)
+        segment.sacked = True
+        self.sackedBytes += segment.length
+
+    def markLost(self, segment: Segment):
+        segment.lost = True
+        self.lostBytes += segment.length
+
+    def unmarkLost(self, segment: Segment):
+        if segment.lost:
+            segment.lost = False
+            self.lostBytes -= segment.length
+
+    def retireUpTo(self, ackNo: int) -> list:
+        '''remove and return every segment covered by a cumulative ACK'''
+        if ackNo not in self.byAck:
+            return []
+        retired = []
+        while True:
+            segment = self.segments.popleft()
+            del self.byAck[segment.ackNo]
+            del self.bySeq[segment.seqNo]
+            self.bytes -= segment.length
+            if segment.sacked:
+                self.sackedBytes -= segment.length
+            self.unmarkLost(segment)
+            retired.append(segment)
+            if segment.ackNo == ackNo:
+                return retired
+
+class SegmentSource:
+    '''
+    Hands out the payload of each DATA segment in order. Regular files are
+    memory-mapped and every segment is a memoryview slice of the map, so nothing
+    is copied until the header is attached. Pipes, stdin ("-") and empty files
+    cannot be mapped and are read CHUNK segments at a time instead.
+    '''
+    CHUNK = 64
+
+    def __init__(self, fileName: str, segmentSize: int = MSS) -> None:
+        self.segmentSize = segmentSize
+        self.chunkSize = segmentSize * self.CHUNK
+        self.file = sys.stdin.buffer if fileName == "-" else open(fileName, "rb")
+        self.map = None
+        self.view = memoryview(b"")
+        self.offset = 0
+        self.eof = False
+        try:
+            self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        except (ValueError, OSError):
+            return  # empty file, pipe or terminal: fall back to chunked reads
+        if hasattr(mmap, "MADV_SEQUENTIAL"):
+            self.map.madvise(mmap.MADV_SEQUENTIAL)
+        self.view = memoryview(self.map)
+        self.eof = True  # the whole file is already in view
+
+    def needsFill(self) -> bool:
+        '''True when next() would block on a read'''
+        return self.offset >= len(self.view) and not self.eof
+
+    def fill(self):
+        '''read the next chunk of a stream that could not be mapped'''
+        chunk = self.file.read(self.chunkSize)
+        if len(chunk) < self.chunkSize:
+            self.eof = True
+        self.view = memoryview(chunk)
+        self.offset = 0
+
+    def next(self):
+        '''payload of the next segment, or None at end of file'''
+        if self.needsFill():
+            self.fill()
+        if self.offset >= len(self.view):
+            return None
+        segment = self.view[self.offset:self.offset + self.segmentSize]
+        self.offset += len(segment)
+        return segment
+
+    def close(self):
+        self.view.release()
+        if self.map is not None:
+            try:
+                self.map.close()
+            except BufferError:
+                pass  # a segment still holds a view, the map is freed along with it
+        if self.file is not sys.stdin.buffer:
+            self.file.close()
+
+class RtoEstimator:
+    '''
+    Retransmission timeout from RFC 6298. Samples update the smoothed RTT and its
+    variance, a timeout doubles the RTO until the next valid sample, and the
+    result is clamped to [minRto, maxRto]. In fixed mode the initial value is
+    kept and samples only feed the statistics.
+    '''
+    ALPHA = 1 / 8
+    BETA = 1 / 4
+    K = 4
+    GRANULARITY = 0.001
+
+    def __init__(self, initial: float, minRto: float, maxRto: float, adaptive: bool = True) -> None:
+        if not 0 < minRto <= maxRto:
+            raise ValueError(f"bad RTO bounds [{minRto}, {maxRto}]")
+        self.adaptive = adaptive
+        self.minRto = minRto
+        self.maxRto = maxRto
+        self.value = initial if not adaptive else min(max(initial, minRto), maxRto)
+        self.srtt = None
+        self.rttvar = None
+        self.samples = 0
+        self.backoffs = 0
+
+    def sample(self, rtt: float):
+        if self.srtt is None:
+            self.srtt = rtt
+            self.rttvar = rtt / 2
+        else:
+            self.rttvar = (1 - self.BETA) * self.rttvar + self.BETA * abs(self.srtt - rtt)
+            self.srtt = (1 - self.ALPHA) * self.srtt + self.ALPHA * rtt
+        self.samples += 1
+        if self.adaptive:
+            self.value = self.clamp(self.srtt + max(self.GRANULARITY, self.K * self.rttvar))
+
+    def backoff(self):
+        if self.adaptive:
+            self.backoffs += 1
+            self.value = self.clamp(self.value * 2)
+
+    def restore(self):
+        '''
+        New data was acknowledged but cannot be timed (Karn). Linux gets a
+        valid sample from its timestamps here and drops the backoff; without
+        timestamps the last estimate stands in for it, so that the next hole
+        does not double on from the previous one's backoff.
+        '''
+        if self.adaptive and self.srtt is not None:
+            self.value = self.clamp(self.srtt + max(self.GRANULARITY, self.K * self.rttvar))
+
+    def clamp(self, rto: float) -> float:
+        return min(max(rto, self.minRto), self.maxRto)
+
+class ControlBlock:
+    def __init__(self) -> None:
+        self.seqNo = 0
+        self.sentPackets = SendQueue()
+
+class RetransmissionTimers:
+    '''
+    One retransmission deadline per in-flight segment, kept in a heap ordered by
+    deadline. Cancelling only clears segment.deadline; the stale heap entry is
+    skipped when it reaches the top, so start, cancel and expiry are all
+    O(log n) at worst.
+
+    An expiry is spurious when the original copy did arrive: its ACK comes back
+    sooner than one RTT after the retransmission, or the receiver reports the
+    retransmitted copy as a duplicate with a D-SACK block. Without SACK only the
+    first can be seen, so the other expiries cannot be called real.
+    '''
+    HORIZON = 60  # seconds an expiry waits for its D-SACK before it is no longer judged
+
+    def __init__(self) -> None:
+        self.heap = []
+        self.counter = 0  # tie breaker so the heap never compares segments
+        self.minRtt = None
+        self.expirations = 0
+        self.spuriousExpirations = 0
+        self.suspects = {}  # seqNo -> time of expiry, oldest first, until judged spurious or forgotten
+
+    def start(self, segment: Segment, deadline: float):
+        segment.deadline = deadline
+        heapq.heappush(self.heap, (deadline, self.counter, segment))
+        self.counter += 1
+
+    def cancel(self, segment: Segment, now: float):
+        '''the segment was acknowledged: drop its timer and judge an earlier expiry'''
+        segment.deadline = None
+        if not segment.timedOut:
+            return
+        # an ACK for the retransmitted copy cannot come back faster than one RTT,
+        # so an earlier ACK belongs to the original and the expiry was spurious
+        if self.minRtt is not None and now - segment.sendTime < self.minRtt:
+            self.spurious(segment.seqNo)
+
+    def spurious(self, seqNo: int):
+        '''the segment at seqNo reached the receiver twice: its last expiry was not needed'''
+        if self.suspects.pop(seqNo, None) is not None:
+            self.spuriousExpirations += 1
+
+    def sampleRtt(self, rtt: float):
+        if self.minRtt is None or rtt < self.minRtt:
+            self.minRtt = rtt
+
+    def nextDeadline(self):
+        '''earliest live deadline, or None when nothing is in flight'''
+        while self.heap:
+            deadline, _, segment = self.heap[0]
+            if segment.deadline == deadline:
+                return deadline
+            heapq.heappop(self.heap)
+        return None
+
+    def expire(self, now: float) -> list:
+        '''pop every segment whose deadline has passed'''
+        expired = []
+        while self.heap and self.heap[0][0] <= now:
+            deadline, _, segment = heapq.heappop(self.heap)
+            if segment.deadline != deadline:
+                continue
+            segment.deadline = None
+            segment.timedOut = True
+            self.expirations += 1
+            self.suspects.pop(segment.seqNo, None)
+            self.suspects[segment.seqNo] = now
+            expired.append(segment)
+        for seqNo, expiry in list(self.suspects.items()):
+            if expiry >= now - self.HORIZON:
+                break
+            del self.suspects[seqNo]
+        return expired
+
+class Sender:
+    def __init__(self, sender_port: int, receiver_port: int, filename: str, max_win: int, rot: int, engine: str = "thread",
+                 rto_mode: str = "adaptive", rto_min: str = "0.2", rto_max: str = "60", cc: str = "newreno", pacing: str = "on",
+                 sack: str = "on", header: str = "auto", mss: str = str(MSS), batch: str = "on", log: str = "text",
+                 metrics: str = "", metrics_interval: str = "1", metrics_hooks: str = "off", fec: str = "off",
+                 compress: str = "off") -> None:
+        '''
+        The Sender will be able to connect the Receiver via UDP
+        :param sender_port: the UDP port number to be used by the sender to send PTP segments to the receiver
+        :param receiver_port: the UDP port number on which receiver is expecting to receive PTP segments from the sender
+        :param filename: the name of the text file that must be transferred from sender to receiver using your reliable transport protocol.
+        :param max_win: the maximum window size in bytes for the sender window.
+        :param rot: the value of the retransmission timer in milliseconds. This should be an unsigned integer.
+        :param engine: "thread" for the listen/timeOut threads, "asyncio" for the event-driven engine.
+        :param rto_mode: "adaptive" to derive the timeout from measured RTTs, "fixed" to always use rot.
+        :param rto_min: lower clamp of the adaptive timeout in seconds, 0.2 as in Linux TCP.
+        :param rto_max: upper clamp of the adaptive timeout in seconds.
+        :param cc: congestion controller, one of congestion.CONTROLLERS.
+        :param pacing: "on" to pace sends across the RTT, "off" to send each window as a burst.
+        :param sack: "on" to offer selective acknowledgements in the SYN.
+        :param header: header version "1" or "2", or "auto" for 2 only when max_win does not fit version 1.
+        :param mss: largest DATA payload to offer in the SYN.
+        :param batch: "on" to send through GSO batches and read ACKs with GRO where the kernel supports it.
+        :param log: "text" for Sender_log.txt lines, "trace" for binary records in Sender_trace.bin, "stats" for statistics only.
+        :param metrics: JSON snapshot file, or unix:<path> for a stats socket; empty for no live metrics.
+        :param metrics_interval: seconds between snapshot files.
+        :param metrics_hooks: "on" to time the hot-path methods.
+        :param fec: "off", or K:M to offer M XOR parity segments after every K DATA segments.
+        :param compress: "off", or zlib, lzma or zstd with an optional :level to offer stream compression.
+        '''
+        self.sender_port = int(sender_port)
+        self.receiver_port = int(receiver_port)
+        self.sender_address = ("127.0.0.1", self.sender_port)
+        self.receiver_address = ("127.0.0.1", self.receiver_port)
+
+        self.cb = ControlBlock()
+        self.metrics = openMetrics(metrics, metrics_interval)
+        if metrics_hooks not in ("on", "off"):
+            raise ValueError(f"bad metrics_hooks {metrics_hooks!r}, expected on or off")
+        # measuring lock wait needs a wrapper, plain Lock when nobody looks
+        self.control_lock = threading.Lock() if self.metrics is None else TimedLock(self.metrics.histogram("lockWait"))
+        self.timerCondition = threading.Condition(self.control_lock)  # wakes timeOut when an earlier deadline is added
+        self.startTime = time.time()
+        self.dataTransferred = 0
+        self.dataSegments = 0
+        self.retransmittedSegments = 0
+        self.duplicateACKS = 0
+        self.paritySegments = 0
+        self.bytesAcked = 0
+        self.rot = rot
+        self.fileName = filename
+        self.max_win = int(max_win)
+        self.events = openEventLog(log, logging.getLogger(), "Sender_trace.bin")
+        self.offeredMss = int(mss)
+        self.mss = MSS  # until the receiver answers OPT_MSS
+        # serial arithmetic needs a window plus one segment to fit in half the space
+        fitsV1 = self.max_win + self.offeredMss <= MAXSEQNO // 2
+        if header not in ("auto", "1", "2"):
+            raise ValueError(f"bad header {header!r}, expected auto, 1 or 2")
+        if header == "auto":
+            self.version = HEADER_V1 if fitsV1 else HEADER_V2
+        else:
+            self.version = int(header)
+        if self.version == HEADER_V1 and not fitsV1:
+            raise ValueError(f"max_win {self.max_win} does not fit the version 1 sequence space, use --header=2")
+        if not 0 < self.offeredMss <= MAXDATAGRAM - HEADERSIZE[self.version]:
+            raise ValueError(f"bad mss {mss!r}, expected 1 to {MAXDATAGRAM - HEADERSIZE[self.version]} bytes")
+        self.seqSpace = SEQSPACE[self.version]
+        self.lastAckNo = None  # highest cumulative ACK so far
+        self.dupAcks = 0  # duplicates of lastAckNo since it last advanced
+        self.timers = RetransmissionTimers()
+        if rto_mode not in ("adaptive", "fixed"):
+            raise ValueError(f"unknown rto mode {rto_mode!r}, expected adaptive or fixed")
+        self.rto = RtoEstimator(float(rot), float(rto_min), float(rto_max), rto_mode == "adaptive")
+        if engine not in ("thread", "asyncio"):
+            raise ValueError(f"unknown engine {engine!r}, expected thread or asyncio")
+        self.engine = engine
+        if cc not in CONTROLLERS:
+            raise ValueError(f"unknown congestion controller {cc!r}, expected one of {', '.join(CONTROLLERS)}")
+        self.cc = CONTROLLERS[cc](MSS, self.max_win)
+        self.recoverySegment = None  # last segment in flight when fast recovery started
+        self.retransmitQueue = deque()  # timed-out segments behind the head, released through the window
+        if pacing not in ("on", "off"):
+            raise ValueError(f"bad pacing {pacing!r}, expected on or off")
+        self.pacer = Pacer(MSS) if pacing == "on" else None
+        if sack not in ("on", "off"):
+            raise ValueError(f"bad sack {sack!r}, expected on or off")
+        self.offeredOptions = {OPT_SACK: b""} if sack == "on" else {}
+        if self.offeredMss != MSS:
+            # the default goes unsaid, so a SYN without options still suits the original receiver
+            self.offeredOptions[OPT_MSS] = self.offeredMss.to_bytes(2, "big")
+        if self.version == HEADER_V2:
+            self.offeredOptions[OPT_WSCALE] = bytes((0,))  # nothing flows towards us
+        if fec != "off":
+            self.offeredOptions[OPT_FEC] = bytes(parseFec(fec))
+        self.fec = None  # ParityEncoder once the receiver echoes OPT_FEC
+        self.dupThresh = DUPTHRESH  # duplicate ACKs or SACKed segments that declare a hole lost
+        self.compression = None  # (codec, level) once the receiver echoes OPT_COMPRESS
+        self.source = None
+        if compress != "off":
+            codec, level = parseCompression(compress)
+            ratio = probe(self.fileName, codec, level)
+            if ratio is None or ratio <= 1 - MINSAVING:
+                self.offeredOptions[OPT_COMPRESS] = bytes((codec,))
+                self.compressLevel = level
+            else:
+                self.events.info(f"Compression:\toff, a sample of the file only shrinks to {ratio:.0%}")
+        self.sack = False  # set once the receiver echoes OPT_SACK
+        self.windowShift = 0
+        self.rwnd = None  # receive window from version 2 ACKs, None while unknown
+
+        # asyncio engine state, unused by the thread engine
+        self.loop = None
+        self.changed = None  # future resolved whenever an ACK or a timeout changes sentPackets
+        self.timerHandle = None
+
+        random.seed()
+        self.cb.seqNo = random.randint(0, self.seqSpace - 1)
+        while (self.cb.seqNo > (self.seqSpace - 100)):
+            self.cb.seqNo = random.randint(0, self.seqSpace - 1)
+
+
+        # init the UDP socket
+        self.sender_socket = socket.socket(family=socket.AF_INET, type=socket.SOCK_DGRAM)
+        self.sender_socket.bind(self.sender_address)
+        if batch not in ("on", "off"):
+            raise ValueError(f"bad batch {batch!r}, expected on or off")
+        if batch == "on":
+            enlargeBuffers(self.sender_socket)
+        self.batch = BatchSender(self.sender_socket, gso=batch == "on")
+        self.ackReceiver = BatchReceiver(self.sender_socket, gro=batch == "on")
+        self._is_active = True  # for the multi-threading
+
+        if self.metrics is not None:
+            self.metrics.addSource("sender", self.metricsSnapshot)
+            if metrics_hooks == "on":
+                self.metrics.instrument(self, ["sendPacket", "processAck", "expireTimers"])
+
+    def startThreads(self):
+        '''start the listening and timeout sub-threads used by the thread engine'''
+        self.listenThread = threading.Thread(target=self.listen)
+        self.listenThread.daemon = True
+        self.listenThread.start()
+
+        self.timeOutThread = threading.Thread(target=self.timeOut)
+        self.timeOutThread.daemon = True
+        self.timeOutThread.start()
+
+    def ptp_open(self):
+        #CLOSED -> SYNSENT: Open/send SYN
+        time.sleep(0.5)
+        self.startTime = time.time()
+        self.control_lock.acquire()
+        self.sendPacket(encodeOptions(self.offeredOptions), SYN)
+        self.cb.seqNo += 1
+        self.control_lock.release()
+
+    def openSource(self):
+        '''the file cut into segments of the agreed size, compressed if the receiver agreed to it'''
+        if self.compression is None:
+            return SegmentSource(self.fileName, self.mss)
+        self.source = CompressedSource(SegmentSource(self.fileName, READSIZE), *self.compression, self.mss)
+        return self.source
+
+    def nextSegment(self, source: SegmentSource):
+        '''take the next payload from the file and count it as original data'''
+        segment = source.next()
+        if segment is not None:
+            self.dataTransferred += len(segment)
+            self.dataSegments += 1
+        return segment
+
+    def ptp_send(self):
+        '''(Multithread is used)send packets'''
+        #idle waiting for first response
+        while True:
+            self.control_lock.acquire()
+            if (len(self.cb.sentPackets) == 0):
+                self.control_lock.release()
+                break
+            if (len(self.cb.sentPackets) > 0 and self.cb.sentPackets.head().retries >= 3):
+                self.sendPacket(bytearray(0), RESET)
+                self.control_lock.release()
+                exit(0)
+            self.control_lock.release()
+        # the segment size is only known once the SYN is acknowledged
+        source = self.openSource()
+        #send rest of packets, batching what the window allows and reading pipes outside the lock
+        segment = self.nextSegment(source)
+        while self._is_active:
+            self.control_lock.acquire()
+            if segment is None and self.fec is not None:
+                self.sendParity(self.fec.flush())  # the short last block
+            if segment is None and len(self.cb.sentPackets) == 0:
+                self.control_lock.release()
+                break
+            sent = False
+            wait = self.releaseRetransmissions()
+            while wait == 0 and segment is not None and self.windowOpen():
+                wait = self.paceDelay()
+                if wait > 0:
+                    break
+                self.sendPacket(segment, DATA, batch=True)
+                sent = True
+                if source.needsFill():
+                    break
+                segment = self.nextSegment(source)
+                sent = False
+            self.batch.flush()
+            self.control_lock.release()
+            if sent:
+                segment = self.nextSegment(source)
+            elif wait > 0:
+                time.sleep(wait)
+        source.close()
+
+
+    def ptp_close(self):
+        self.control_lock.acquire()
+        self.sendPacket(bytearray(0), FIN)
+        self.control_lock.release()
+        while True:
+            self.control_lock.acquire()
+            if len(self.cb.sentPackets) == 0:
+                self.control_lock.release()
+                break
+            self.control_lock.release()
+        self._is_active = False  # close the sub-thread
+        self.control_lock.acquire()
+        self.timerCondition.notify()
+        self.control_lock.release()
+        self.logStatistics()
+        self.events.close()
+        if self.metrics is not None:
+            self.metrics.stop()
+        exit(0)
+
+    def metricsSnapshot(self) -> dict:
+        '''live counters and gauges for metrics.py, read without control_lock'''
+        elapsed = time.time() - self.startTime
+        return {
+            "elapsed": elapsed,
+            "goodput": self.bytesAcked / elapsed if elapsed > 0 else 0,
+            "bytesAcked": self.bytesAcked,
+            "dataTransferred": self.dataTransferred,
+            "dataSegments": self.dataSegments,
+            "retransmittedSegments": self.retransmittedSegments,
+            "paritySegments": self.paritySegments,
+            "fileBytesSent": self.dataTransferred if self.source is None else self.source.rawBytes,
+            "duplicateAcks": self.duplicateACKS,
+            "timerExpirations": self.timers.expirations,
+            "spuriousExpirations": self.timers.spuriousExpirations,
+            "inFlight": self.cb.sentPackets.bytes,
+            "sacked": self.cb.sentPackets.sackedBytes,
+            "segmentsInFlight": len(self.cb.sentPackets),
+            "congestionControl": self.cc.name,
+            "cwnd": self.cc.window(),
+            "ssthresh": self.cc.ssthresh,
+            "inRecovery": self.cc.inRecovery,
+            "rwnd": self.rwnd,
+            "rto": self.rto.value,
+            "srtt": self.rto.srtt,
+            "mss": self.mss,
+        }
+
+    def logStatistics(self):
+        self.events.info(f"Amount of (original) Data Transferred (in bytes) (excluding retransmissions):\t{self.dataTransferred}")
+        self.events.info(f"Number of Data Segments Sent (excluding retransmissions):\t{self.dataSegments}")
+        self.events.info(f"Number of Retransmitted Data Segments:\t{self.retransmittedSegments}")
+        self.events.info(f"Number of Duplicate Acknowledgements received:\t{self.duplicateACKS}")
+        self.events.info(f"Transfer Time (ms):\t{round((time.time() - self.startTime) * 1000, 3)}")  # SYN to the ACK of the FIN
+        # without D-SACK an expiry whose original did arrive cannot be told from a real one
+        real = self.timers.expirations - self.timers.spuriousExpirations if self.sack else "-"
+        self.events.info(f"Number of Retransmission Timer Expirations (real):\t{real}")
+        self.events.info(f"Number of Retransmission Timer Expirations (spurious):\t{self.timers.spuriousExpirations}")
+        srtt = "-" if self.rto.srtt is None else round(self.rto.srtt * 1000, 3)
+        self.events.info(f"Smoothed RTT (ms):\t{srtt}")
+        self.events.info(f"Final RTO (ms):\t{round(self.rto.value * 1000, 3)}")
+        self.events.info(f"Congestion Control:\t{self.cc.name}")
+        self.events.info(f"Final Congestion Window (bytes):\t{self.cc.window()}")
+        if self.source is not None:
+            self.events.info(f"Compression:\t{self.source.rawBytes} file bytes sent as {self.dataTransferred}")
+        if self.fec is not None:
+            self.events.info(f"Number of Parity Segments Sent (FEC):\t{self.paritySegments}")
+
+
+    def timeOut(self):
+        '''(Multithread is used) handler for timeout events'''
+        self.control_lock.acquire()
+        while self._is_active:
+            self.expireTimers()
+            deadline = self.timers.nextDeadline()
+            self.timerCondition.wait(None if deadline is None else max(deadline - time.time(), 0))
+        self.control_lock.release()
+
+    def expireTimers(self):
+        '''retransmit every segment whose own deadline has passed'''
+        now = time.time()
+        queue = self.cb.sentPackets
+        if len(queue) > 0 and queue.head().deadline is not None and queue.head().deadline <= now:
+            # back off once per loss episode, as a single TCP timer would,
+            # not once for every segment of a window that timed out together
+            self.rto.backoff()
+            self.logRto()
+            self.cc.onTimeout(queue.bytes)
+            self.recoverySegment = None
+            if not self.sack:
+                # nothing behind the head can be acknowledged before it is, so their
+                # timers restart from its retransmission instead of each running out
+                self.restartTimers(itertools.islice(queue.segments, 1, None), now + self.rto.value)
+        for segment in self.timers.expire(now):
+            if segment is queue.head():
+                self.retransmit(segment)  # a timeout resends the oldest segment whatever the window
+            else:
+                # the rest is resent as the collapsed window and the pacer allow,
+                # not all at once right after the backoff
+                queue.markLost(segment)
+                self.retransmitQueue.append(segment)
+
+    def releaseRetransmissions(self) -> float:
+        '''
+        resend queued timed-out segments while the window is open; seconds the
+        pacer asks to wait before the next one, else 0. Caller holds control_lock.
+        '''
+        queue = self.retransmitQueue
+        while queue:
+            if not queue[0].lost:
+                queue.popleft()  # acknowledged, SACKed or fast-retransmitted meanwhile
+                continue
+            if not self.windowOpen():
+                return 0
+            wait = self.paceDelay()
+            if wait > 0:
+                return wait
+            self.retransmit(queue.popleft(), batch=True)
+        return 0
+
+    def restartTimers(self, segments, deadline: float):
+        '''move every live deadline among segments to deadline, as restarting a single timer would'''
+        for segment in segments:
+            if segment.deadline is not None:
+                self.timers.start(segment, deadline)
+
+    def logRto(self):
+        self.events.rto(time.time() - self.startTime, self.rto.value)
+
+    def retransmit(self, segment: Segment, batch: bool = False):
+        '''resend a segment held in sentPackets and restart its timer; caller holds control_lock'''
+        self.retransmittedSegments += 1
+        self.cb.sentPackets.unmarkLost(segment)
+        self.transmit(segment.message, batch)
+        if self.pacer is not None:
+            self.pacer.consume(HEADERSIZE[self.version] + segment.length, time.time())
+        segment.sendTime = time.time()
+        segment.retries += 1
+        self.startTimer(segment)
+        self.events.packet(SND, segment.type, segment.seqNo, segment.length, time.time() - self.startTime)
+
+    def listen(self):
+        '''(Multithread is used)listen the response from receiver'''
+        while self._is_active:
+            messages, _ = self.ackReceiver.recv()
+            self.control_lock.acquire()
+            try:
+                for incoming_message in messages:
+                    self.processAck(incoming_message)
+            finally:
+                self.control_lock.release()
+
+    def processAck(self, incoming_message: bytes):
+        '''update sentPackets for one segment from the receiver; caller holds control_lock'''
+        header = decodeHeader(incoming_message)
+        if header is None:
+            return  # runt or unknown version
+        _, type, ackNo, window, payload = header
+        self.events.packet(RCV, ACK, ackNo, 0, time.time() - self.startTime, LEFTALIGN)
+        if type != ACK:
+            return
+        retired = self.cb.sentPackets.retireUpTo(ackNo)
+        synAck = False  # the payload carries options, not SACK blocks
+        if retired:
+            now = time.time()
+            ackedBytes = 0
+            for segment in retired:
+                self.retire(segment, now)
+                ackedBytes += segment.length
+                if segment.type == SYN:
+                    self.negotiate(decodeOptions(payload))
+                    synAck = True
+            # Karn's rule: an ACK that covers a retransmitted segment cannot be timed
+            rtt = None
+            if all(segment.retries == 0 for segment in retired):
+                rtt = now - retired[-1].sendTime
+                if self.metrics is not None:
+                    self.metrics.observe("rtt", rtt)
+                rto = self.rto.value
+                self.rto.sample(rtt)
+                if self.rto.value != rto:
+                    self.logRto()
+            else:
+                rto = self.rto.value
+                self.rto.restore()
+                if self.rto.value != rto:
+                    self.logRto()
+                    if not self.sack:
+                        self.restartTimers(self.cb.sentPackets.segments, now + self.rto.value)
+            self.bytesAcked += ackedBytes
+            self.cc.onAck(ackedBytes, rtt, self.cb.sentPackets.bytes)
+            if self.cc.inRecovery:
+                if any(segment is self.recoverySegment for segment in retired) or len(self.cb.sentPackets) == 0:
+                    self.cc.onRecoveryExit()
+                    self.recoverySegment = None
+                elif self.shouldRetransmit(self.cb.sentPackets.head(), now):
+                    # NewReno partial ACK: the next hole is lost as well
+                    self.retransmit(self.cb.sentPackets.head())
+            if self.pacer is not None:
+                self.pacer.update(self.cc.window(), self.rto.srtt, self.cc.slowStart())
+            self.lastAckNo = ackNo
+            self.dupAcks = 0
+        else:
+            #an ACK that retires nothing repeats one we already have
+            self.duplicateACKS += 1
+            if ackNo == self.lastAckNo and len(self.cb.sentPackets) > 0:
+                self.dupAcks += 1
+                if self.dupAcks == self.dupThresh and not self.cc.inRecovery:
+                    self.enterRecovery()
+                    if self.shouldRetransmit(self.cb.sentPackets.head(), time.time()):
+                        self.retransmit(self.cb.sentPackets.head())
+                elif self.dupAcks > self.dupThresh:
+                    self.cc.onDupAck()
+        if window is not None:
+            self.rwnd = window << self.windowShift
+        if self.sack and not synAck:
+            blocks = decodeSack(payload, 2 if self.version == HEADER_V1 else 4)
+            if blocks and self.isDsack(blocks, ackNo):
+                self.timers.spurious(blocks.pop(0)[0])
+            if blocks and len(self.cb.sentPackets) > 0:
+                self.processSack(blocks)
+
+    def isDsack(self, blocks: list, ackNo: int) -> bool:
+        '''RFC 2883: a first block below the cumulative ACK or inside the second block reports a duplicate'''
+        start, end = blocks[0]
+        if seqBefore(start, ackNo, self.seqSpace):
+            return True
+        return (len(blocks) > 1 and not seqBefore(start, blocks[1][0], self.seqSpace)
+                and not seqBefore(blocks[1][1], end, self.seqSpace))
+
+    def negotiate(self, accepted: dict):
+        '''options echoed by the receiver in the ACK of our SYN'''
+        self.sack = OPT_SACK in accepted and OPT_SACK in self.offeredOptions
+        if OPT_WSCALE in accepted and OPT_WSCALE in self.offeredOptions:
+            self.windowShift = accepted[OPT_WSCALE][0]
+        if OPT_MSS in accepted:
+            self.mss = min(int.from_bytes(accepted[OPT_MSS], "big"), self.offeredMss)
+        if OPT_FEC in accepted and OPT_FEC in self.offeredOptions:
+            self.fec = ParityEncoder(*self.offeredOptions[OPT_FEC])
+            # give the parity of a hole's block time to arrive before resending the hole
+            k, m = self.offeredOptions[OPT_FEC]
+            self.dupThresh = DUPTHRESH + k + m
+        if OPT_COMPRESS in accepted and OPT_COMPRESS in self.offeredOptions:
+            self.compression = (self.offeredOptions[OPT_COMPRESS][0], self.compressLevel)
+        if self.mss != self.cc.mss:
+            # nothing has been sent under the old segment size yet
+            self.cc = CONTROLLERS[self.cc.name](self.mss, self.max_win)
+            if self.pacer is not None:
+                self.pacer = Pacer(self.mss)
+
+    def enterRecovery(self):
+        self.cc.onFastRetransmit(self.cb.sentPackets.bytes - self.cb.sentPackets.sackedBytes)
+        self.recoverySegment = self.cb.sentPackets.tail()
+
+    def shouldRetransmit(self, segment: Segment, now: float) -> bool:
+        '''not known to be received and not already resent within the last RTT'''
+        if segment.sacked:
+            return False
+        return segment.retries == 0 or now - segment.sendTime >= (self.rto.srtt or self.rto.value)
+
+    def processSack(self, blocks: list):
+        '''
+        Mark every segment inside the SACK blocks as received, so it is neither
+        timed out nor counted in flight, then resend each hole that has at least
+        dupThresh segments' worth of SACKed data above it. All holes go out in the
+        same RTT instead of one per round trip.
+        '''
+        queue = self.cb.sentPackets
+        cumulative = queue.head().seqNo
+        edges = []
+        for start, end in blocks:
+            # walk in from both edges; stop at segments marked by earlier ACKs
+            segment = queue.byAck.get(end)
+            while segment is not None and not segment.sacked:
+                queue.markSacked(segment)
+                segment.deadline = None
+                segment = queue.byAck.get(segment.seqNo) if segment.seqNo != start else None
+            segment = queue.bySeq.get(start)
+            while segment is not None and not segment.sacked:
+                queue.markSacked(segment)
+                segment.deadline = None
+                segment = queue.bySeq.get(segment.ackNo) if segment.ackNo != end else None
+            if start in queue.bySeq and end in queue.byAck:
+                edges.append(((start - cumulative) % self.seqSpace, start, end))
+        if not edges:
+            return
+        edges.sort()
+        now = time.time()
+        holeStart = cumulative
+        sackedAbove = sum((end - start) % self.seqSpace for _, start, end in edges)
+        lost = []
+        for _, start, end in edges:
+            if sackedAbove < self.dupThresh * self.mss:
+                break
+            segment = queue.bySeq.get(holeStart)
+            while segment is not None and segment.seqNo != start:
+                if self.shouldRetransmit(segment, now):
+                    lost.append(segment)
+                segment = queue.bySeq.get(segment.ackNo)
+            sackedAbove -= (end - start) % self.seqSpace
+            holeStart = end
+        if lost and not self.cc.inRecovery:
+            self.enterRecovery()
+        for segment in lost:
+            self.retransmit(segment)
+
+    def windowOpen(self) -> bool:
+        '''
+        room for another segment under the congestion window (capped by max_win)
+        and, with version 2 headers, under the receiver's advertised window
+        '''
+        queue = self.cb.sentPackets
+        if self.rwnd is not None and queue.bytes >= self.rwnd:
+            return False
+        return queue.bytes - queue.sackedBytes - queue.lostBytes < self.cc.window()
+
+    def paceDelay(self) -> float:
+        return 0 if self.pacer is None else self.pacer.delay(time.time())
+
+    def retire(self, segment: Segment, now: float):
+        '''an acknowledged segment left sentPackets: stop its timer'''
+        if segment.retries == 0:
+            self.timers.sampleRtt(now - segment.sendTime)
+        self.timers.cancel(segment, now)
+        segment.message = None  # stale timer entries must not pin the file mapping
+
+    def run(self):
+        '''
+        This function contain the main logic of the receiver
+        '''
+        if self.metrics is not None:
+            self.metrics.start()
+        if self.engine == "asyncio":
+            asyncio.run(self.runAsync())
+            exit(0)
+        self.startThreads()
+        self.ptp_open()
+        self.ptp_send()
+        self.ptp_close()
+
+    async def runAsync(self):
+        '''event-driven counterpart of run(): one loop, no polling threads'''
+        self.loop = asyncio.get_running_loop()
+        self.sender_socket.setblocking(False)
+        self.loop.add_reader(self.sender_socket.fileno(), self.onReadable)
+        try:
+            await asyncio.sleep(0.5)
+            self.startTime = time.time()
+            self.sendPacket(encodeOptions(self.offeredOptions), SYN)
+            self.cb.seqNo += 1
+            if not await self.sendAsync():
+                return
+            self.sendPacket(bytearray(0), FIN)
+            while len(self.cb.sentPackets) > 0:
+                await self.waitForChange()
+            self._is_active = False
+            self.logStatistics()
+        finally:
+            self.cancelTimer()
+            self.loop.remove_reader(self.sender_socket.fileno())
+            self.sender_socket.close()
+            self.events.close()
+            if self.metrics is not None:
+                self.metrics.stop()
+
+    async def sendAsync(self) -> bool:
+        '''send the file once the SYN is acknowledged; False if the connection was reset'''
+        #wait for first response without spinning
+        while len(self.cb.sentPackets) > 0:
+            if self.cb.sentPackets.head().retries >= 3:
+                self.sendPacket(bytearray(0), RESET)
+                return False
+            await self.waitForChange()
+        source = self.openSource()
+        try:
+            exhausted = False
+            while not exhausted or len(self.cb.sentPackets) > 0:
+                while self.windowOpen() and (self.retransmitQueue or not exhausted):
+                    wait = self.releaseRetransmissions() or self.paceDelay()
+                    if wait > 0:
+                        self.batch.flush()
+                        await asyncio.sleep(wait)
+                        continue
+                    if exhausted or not self.windowOpen():
+                        continue
+                    if source.needsFill():
+                        # reading a pipe or stdin and compressing block, so do them off the event loop
+                        self.batch.flush()
+                        await self.loop.run_in_executor(None, source.fill)
+                    segment = self.nextSegment(source)
+                    if segment is None:
+                        exhausted = True
+                        if self.fec is not None:
+                            self.sendParity(self.fec.flush())  # the short last block
+                    else:
+                        self.sendPacket(segment, DATA, batch=True)
+                self.batch.flush()
+                if len(self.cb.sentPackets) > 0:
+                    await self.waitForChange()
+            return True
+        finally:
+            source.close()
+
+    def waitForChange(self) -> asyncio.Future:
+        '''future resolved by the next ACK or timer expiry'''
+        if self.changed is None or self.changed.done():
+            self.changed = self.loop.create_future()
+        return self.changed
+
+    def notifyChange(self):
+        if self.changed is not None and not self.changed.done():
+            self.changed.set_result(None)
+
+    def onReadable(self):
+        '''asyncio engine: process the ACKs queued on the socket, then wake the sending coroutine once'''
+        for _ in range(READBATCH):
+            try:
+                messages, _ = self.ackReceiver.recv()
+            except (BlockingIOError, ConnectionRefusedError):
+                break  # drained, or ICMP port unreachable before the receiver is up; the timer retransmits
+            for incoming_message in messages:
+                self.processAck(incoming_message)
+        self.notifyChange()
+
+    def startTimer(self, segment: Segment):
+        '''give a segment its own retransmission deadline and wake whoever waits on timers'''
+        self.timers.start(segment, segment.sendTime + self.rto.value)
+        if self.loop is not None:
+            self.armTimer()
+        else:
+            self.timerCondition.notify()
+
+    def armTimer(self):
+        '''keep one call_later handle pointed at the earliest live deadline'''
+        deadline = self.timers.nextDeadline()
+        if deadline is None:
+            return
+        if self.timerHandle is not None:
+            if self.timerHandle.when() <= self.loop.time() + deadline - time.time():
+                return
+            self.timerHandle.cancel()
+        self.timerHandle = self.loop.call_later(max(deadline - time.time(), 0), self.onTimer)
+
+    def cancelTimer(self):
+        if self.timerHandle is not None:
+            self.timerHandle.cancel()
+            self.timerHandle = None
+
+    def onTimer(self):
+        self.timerHandle = None
+        self.expireTimers()
+        self.notifyChange()
+        self.armTimer()
+
+    def transmit(self, message: tuple, batch: bool = False):
+        '''send now, or queue for the next self.batch.flush() when batch is set'''
+        if batch:
+            self.batch.add(message, self.receiver_address)
+        else:
+            self.batch.send(message, self.receiver_address)
+
+    def sendPacket(self, content: bytearray, type: int, batch: bool = False):
+        message = encodeSegment(self.version, type, self.cb.seqNo, content)
+        length = len(content) if type == DATA else 0
+        self.events.packet(SND, type, self.cb.seqNo, length, time.time() - self.startTime)
+        self.transmit(message, batch)
+        if type == DATA and self.pacer is not None:
+            self.pacer.consume(HEADERSIZE[self.version] + len(content), time.time())
+        seqNo = self.cb.seqNo
+        if type == SYN or type == FIN:
+            # SYN options are not stream data: the segment takes one sequence number
+            segment = Segment(seqNo, (self.cb.seqNo + 1) % self.seqSpace, message, 0, type)
+        else:
+            self.cb.seqNo = (self.cb.seqNo + len(content)) % self.seqSpace
+            segment = Segment(seqNo, self.cb.seqNo, message, len(content), type)
+        if type != RESET:
+            self.cb.sentPackets.append(segment)
+            self.startTimer(segment)
+        if type == DATA and self.fec is not None:
+            self.sendParity(self.fec.add(seqNo, content))
+
+    def sendParity(self, parities: list):
+        '''PARITY segments go out with the batch but are neither timed nor kept for retransmission'''
+        for seqNo, content in parities:
+            self.paritySegments += 1
+            self.events.packet(SND, PARITY, seqNo, len(content), time.time() - self.startTime)
+            self.transmit(encodeSegment(self.version, PARITY, seqNo, content), batch=True)
+            if self.pacer is not None:
+                self.pacer.consume(HEADERSIZE[self.version] + len(content), time.time())
+
+if __name__ == '__main__':
+    # logging is useful for the log part: https://docs.python.org/3/library/logging.html
+    logging.basicConfig(
+        filename="Sender_log.txt",
+        filemode="w",
+        format="%(message)s",
+        level=logging.NOTSET)
+
+    if len(sys.argv) < 6:
+        print(
+            "\n===== Error usage, python3 sender.py sender_port receiver_port FileReceived.txt max_win rot [--engine=thread|asyncio] [--rto-mode=adaptive|fixed] [--rto-min=s] [--rto-max=s] [--cc=newreno|vegas|fixed] [--pacing=on|off] [--sack=on|off] [--header=auto|1|2] [--mss=bytes] [--batch=on|off] [--log=text|trace|stats] [--metrics=file.json|unix:path] [--metrics-interval=s] [--metrics-hooks=on|off] [--fec=off|K:M] [--compress=off|zlib|lzma|zstd[:level]] ======\n")
+        exit(0)
+
+    sender = Sender(*sys.argv[1:6], **parseOptions(sys.argv[6:]))
+    sender.run()
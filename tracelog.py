@@ -0,0 +1,188 @@
+"""
+    Packet event logs for the PTP Sender and Receiver
+    Python 3
+    Usage: python3 tracelog.py Sender_trace.bin > Sender_log.txt   (render a trace as the text log)
+    coding: utf-8
+
+    Notes:
+        Every packet event goes through an event log chosen with --log:
+            text  - the original behaviour, one formatted line per event
+            trace - fixed-size binary records in a ring buffer that a background
+                    thread writes out in bulk; render it later with this module
+            stats - no per-packet events, only the statistics at the end
+        The statistics are written to the text log in every mode; a trace keeps
+        a copy as well, so rendering it gives back the complete text log.
+"""
+import atexit
+import struct
+import sys
+import threading
+from packet import TYPENAMES
+
+SND = 0
+RCV = 1
+DRP = 2
+RTO = 3
+TEXT = 4
+EVENTNAMES = {SND: "snd", RCV: "rcv", DRP: "drp", RTO: "rto"}
+LEFTALIGN = 1  # flag: the sender prints ACK numbers of received ACKs left-aligned
+
+# event(1) type(1) flags(2) seqNo(4) value(8) elapsed(8); value is the length, or the RTO in seconds
+RECORD = struct.Struct("<BBHIdd")
+MAGIC = b"PTPTRC01"
+
+
+def formatEvent(event: int, type: int, flags: int, seqNo: int, value: float, elapsed: float) -> str:
+    '''one line of the text log, exactly as the programs have always written it'''
+    time = round(elapsed * 100, 2)
+    if event == RTO:
+        return f"rto\t{time:8}\t{round(value * 1000, 3)}"
+    seq = f"{str(seqNo):8}" if flags & LEFTALIGN else f"{seqNo:8}"
+    return f"{EVENTNAMES[event]}\t{time:8}\t{TYPENAMES[type]:4}\t{seq}\t{int(value):4}"
+
+
+class TextLog:
+    '''format and write every event at once through a logging.Logger'''
+    def __init__(self, logger) -> None:
+        self.logger = logger
+
+    def packet(self, event: int, type: int, seqNo: int, length: int, elapsed: float, flags: int = 0):
+        self.logger.info(formatEvent(event, type, flags, seqNo, length, elapsed))
+
+    def rto(self, elapsed: float, rto: float):
+        self.logger.info(formatEvent(RTO, 0, 0, 0, rto, elapsed))
+
+    def info(self, line: str):
+        self.logger.info(line)
+
+    def close(self):
+        pass
+
+
+class StatsLog(TextLog):
+    '''statistics only'''
+    def packet(self, event: int, type: int, seqNo: int, length: int, elapsed: float, flags: int = 0):
+        pass
+
+    def rto(self, elapsed: float, rto: float):
+        pass
+
+
+class TraceLog(TextLog):
+    '''
+    Events are packed into a ring of CAPACITY records under a short lock and
+    a writer thread drains the filled part with one write every FLUSH_INTERVAL,
+    or as soon as the ring is half full. Should the writer fall behind, the
+    producer waits for room instead of dropping events. Text lines go to the
+    logger and, as a TEXT record followed by the UTF-8 bytes, into the trace.
+    '''
+    CAPACITY = 1 << 16
+    FLUSH_INTERVAL = 0.05
+
+    def __init__(self, logger, fileName: str) -> None:
+        super().__init__(logger)
+        self.file = open(fileName, "wb")
+        self.file.write(MAGIC)
+        self.ring = bytearray(RECORD.size * self.CAPACITY)
+        self.view = memoryview(self.ring)
+        self.head = 0  # records produced
+        self.tail = 0  # records written to the file
+        self.lock = threading.Lock()
+        self.space = threading.Condition(self.lock)
+        self.drainLock = threading.Lock()  # one writer of the file at a time
+        self.wake = threading.Event()
+        self.closed = False
+        self.writer = threading.Thread(target=self.drainLoop, daemon=True)
+        self.writer.start()
+        atexit.register(self.close)
+
+    def packet(self, event: int, type: int, seqNo: int, length: int, elapsed: float, flags: int = 0):
+        self.put(event, type, flags, seqNo, length, elapsed)
+
+    def rto(self, elapsed: float, rto: float):
+        self.put(RTO, 0, 0, 0, rto, elapsed)
+
+    def put(self, *fields):
+        with self.lock:
+            while self.head - self.tail >= self.CAPACITY:
+                self.wake.set()
+                self.space.wait()
+            RECORD.pack_into(self.ring, (self.head % self.CAPACITY) * RECORD.size, *fields)
+            self.head += 1
+            if self.head - self.tail == self.CAPACITY // 2:
+                self.wake.set()
+
+    def info(self, line: str):
+        super().info(line)
+        text = line.encode()
+        self.drain()
+        with self.drainLock:
+            self.file.write(RECORD.pack(TEXT, 0, 0, 0, len(text), 0) + text)
+
+    def drainLoop(self):
+        while not self.closed:
+            self.wake.wait(self.FLUSH_INTERVAL)
+            self.wake.clear()
+            self.drain()
+
+    def drain(self):
+        '''write every record produced so far; the ring is only locked to read the indices'''
+        with self.drainLock:
+            with self.lock:
+                tail, head = self.tail, self.head
+            if head == tail:
+                return
+            start = (tail % self.CAPACITY) * RECORD.size
+            end = (head % self.CAPACITY) * RECORD.size
+            if start < end:
+                self.file.write(self.view[start:end])
+            else:
+                self.file.write(self.view[start:])
+                self.file.write(self.view[:end])
+            with self.lock:
+                self.tail = head
+                self.space.notify_all()
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        self.wake.set()
+        self.writer.join()
+        self.drain()
+        self.file.close()
+        atexit.unregister(self.close)
+
+
+def openEventLog(level: str, logger, traceName: str):
+    if level == "text":
+        return TextLog(logger)
+    if level == "stats":
+        return StatsLog(logger)
+    if level == "trace":
+        return TraceLog(logger, traceName)
+    raise ValueError(f"bad log level {level!r}, expected text, trace or stats")
+
+
+def render(fileName: str):
+    '''yield the text log lines recorded in a trace file'''
+    with open(fileName, "rb") as file:
+        if file.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{fileName} is not a PTP trace")
+        while True:
+            record = file.read(RECORD.size)
+            if len(record) < RECORD.size:
+                return
+            event, type, flags, seqNo, value, elapsed = RECORD.unpack(record)
+            if event == TEXT:
+                yield file.read(int(value)).decode()
+            else:
+                yield formatEvent(event, type, flags, seqNo, value, elapsed)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 2:
+        print("\n===== Error usage, python3 tracelog.py Sender_trace.bin|Receiver_trace.bin ======\n")
+        exit(0)
+    for line in render(sys.argv[1]):
+        print(line)